@@ -1,28 +1,112 @@
+import os
+import sys
+import json
+import threading
 import streamlit as st
-import pandas as pd
-import backend.model_utils
 from datetime import datetime
 
+# Run the same engine as the API: backend modules import each other flat
+# (and the saved model pickles model_utils.TimeCategoryEncoder), so put
+# backend/ on the path instead of importing them as backend.*
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+import model_utils
+import database
+import snapshot
+import event_log
+
 st.set_page_config(page_title="VibeSnack", page_icon="🍿", layout="wide")
 
+# Seconds a fetched catalog/history is reused across reruns and sessions
+DATA_TTL = 30
+
 # Load Model
-@st.cache_resource
-def get_model():
+# Keyed on the model file version, so a finished retrain is picked up by
+# every session on its next rerun without clearing the cache.
+@st.cache_resource(max_entries=2)
+def get_model(version):
     return model_utils.load_model()
 
-model = get_model()
+@st.cache_data(ttl=DATA_TTL)
+def get_catalog_and_history():
+    try:
+        return database.fetch_predict_data()
+    except Exception as e:
+        print(f"Database error: {e}")
+    cached = snapshot.load()
+    if cached is not None:
+        return cached
+    with open(os.path.join(BACKEND_DIR, "snack_catalog.json"), "r") as f:
+        return json.load(f), {}
+
+class RetrainJob:
+    """
+    A single background retrain shared by all sessions.
+    The UI only polls its status, so reruns never block on training.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stage = ""
+        self.fraction = 0.0
+        self.error = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return False
+            self.stage, self.fraction, self.error = "Starting...", 0.0, None
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            return True
+
+    def _progress(self, stage, fraction):
+        self.stage, self.fraction = stage, fraction
+
+    def _run(self):
+        import train_model
+        try:
+            train_model.train(progress=self._progress)
+        except Exception as e:
+            self.error = str(e)
+
+@st.cache_resource
+def get_retrain_job():
+    return RetrainJob()
+
+model = get_model(model_utils.get_model_version())
+retrain_job = get_retrain_job()
 
 # Sidebar
 st.sidebar.title("🍿 VibeSnack")
 st.sidebar.markdown("Your tiny, delightful snack recommender.")
 
-if st.sidebar.button("Retrain Model"):
-    with st.spinner("Training..."):
-        import train_model
-        train_model.train()
-        st.cache_resource.clear()
-        model = get_model()
-    st.sidebar.success("Model retrained!")
+if st.sidebar.button("Retrain Model", disabled=retrain_job.running):
+    if not retrain_job.start():
+        st.sidebar.info("A retrain is already running.")
+
+# Only rendered while a retrain is running, so idle sessions never poll.
+# Once the job is done, a full rerun stops the polling and loads the new model.
+@st.fragment(run_every=1)
+def retrain_progress():
+    job = get_retrain_job()
+    if job.running:
+        st.progress(job.fraction, text=job.stage)
+    else:
+        st.rerun()
+
+with st.sidebar:
+    if retrain_job.running:
+        retrain_progress()
+    elif retrain_job.error:
+        st.error(f"Retrain failed: {retrain_job.error}")
+    elif retrain_job.thread is not None:
+        st.success("Model retrained!")
 
 # Main UI
 st.title("What's the vibe? 🤔")
@@ -59,7 +143,8 @@ with col1:
         }
         
         if model:
-            predictions = model_utils.predict_snack(model, user_input, top_k=5)
+            snack_catalog, user_history = get_catalog_and_history()
+            predictions = model_utils.predict_snack(model, user_input, snack_catalog, user_history, top_k=5)
             st.session_state['predictions'] = predictions
             st.session_state['user_input'] = user_input
             st.session_state['current_index'] = 0
@@ -88,9 +173,14 @@ with col2:
             c1, c2 = st.columns(2)
             with c1:
                 if st.button("Accept ✅", key=f"accept_{idx}"):
-                    model_utils.update_user_history(snack['id'])
-                    st.toast("Saved to your history — used to personalize later!")
-                    st.balloons()
+                    event_log.writer.append(snack['id'], st.session_state['user_input'])
+                    try:
+                        database.breaker.call(database.record_feedback, str(snack['id']))
+                        st.toast("Saved to your history — used to personalize later!")
+                        st.balloons()
+                    except Exception as e:
+                        print(f"Database error: {e}")
+                        st.warning("Couldn't save your choice right now.")
             
             with c2:
                 if st.button("Try another 🔄", key=f"next_{idx}"):
@@ -103,7 +193,7 @@ with col2:
             # Why this snack?
             with st.expander("Why this snack?"):
                 st.write(f"**Model Confidence:** {snack['prob']:.1%}")
-                explanation = model_utils.generate_explanation(st.session_state['user_input'], snack)
+                explanation = model_utils.generate_explanation(st.session_state['user_input'], snack['snack_details'])
                 st.write(explanation)
                 
             # Alternatives (Static list of next 3)
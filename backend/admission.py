@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+
+# Admission control for /predict.
+# At most MAX_CONCURRENT requests run the full path (DB fetch, re-ranking,
+# explanations). Up to MAX_QUEUE more may wait for a slot, each for at most
+# QUEUE_TIMEOUT seconds. Anything beyond that is told to degrade (serve a
+# cheap cached answer) or is shed with a 503.
+#
+# The limiter runs on the event loop before the request is handed to the
+# thread pool, so waiting requests never sit in the pool's queue. Every
+# request also gets a deadline, counted from when it arrived (see
+# ArrivalTimeMiddleware); the admitted path passes what is left of it on to
+# the database call.
+
+MAX_CONCURRENT = int(os.getenv("PREDICT_MAX_CONCURRENT", "8"))
+MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "16"))
+QUEUE_TIMEOUT = float(os.getenv("PREDICT_QUEUE_TIMEOUT_SECONDS", "0.25"))
+DEADLINE_SECONDS = float(os.getenv("PREDICT_DEADLINE_SECONDS", "2.0"))
+RETRY_AFTER_SECONDS = int(os.getenv("PREDICT_RETRY_AFTER_SECONDS", "1"))
+
+ADMITTED = "admitted"
+OVERLOADED = "overloaded"
+
+class ArrivalTimeMiddleware:
+    """Pure ASGI middleware stamping request.state.arrived_at before any other work."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["arrived_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+def deadline_for(request, budget=DEADLINE_SECONDS):
+    """Monotonic deadline of a request, from its arrival time if it was stamped."""
+    arrived_at = getattr(request.state, "arrived_at", None)
+    return (arrived_at if arrived_at is not None else time.monotonic()) + budget
+
+def remaining(deadline):
+    return deadline - time.monotonic()
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Only touched from the event loop
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # Guards stats, which /metrics reads from the thread pool
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "degraded": 0, "shed": 0}
+
+    async def acquire(self, deadline):
+        """
+        Returns ADMITTED (caller must release()) or OVERLOADED.
+        Never waits longer than queue_timeout, nor past the request's deadline.
+        """
+        if self._slots.locked():
+            wait = min(self.queue_timeout, remaining(deadline))
+            if self.waiting >= self.max_queue or wait <= 0:
+                return OVERLOADED
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=wait)
+            except asyncio.TimeoutError:
+                return OVERLOADED
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        with self._lock:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+        return ADMITTED
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def record(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=self.in_flight, waiting=self.waiting)
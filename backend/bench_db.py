@@ -0,0 +1,90 @@
+"""
+Local latency benchmark for the /predict and /feedback data paths.
+
+Runs against a throwaway database on a local mongod (MONGO_URI, default
+mongodb://localhost:27017/) and compares the old query shapes with the ones
+in database.py:
+
+    python bench_db.py [num_snacks] [iterations]
+"""
+import sys
+import time
+import statistics
+from pymongo import MongoClient, ASCENDING
+from pymongo.read_preferences import ReadPreference
+from pymongo.write_concern import WriteConcern
+from database import MONGO_URI, SNACK_PROJECTION, HISTORY_ID
+from data_generator import SNACK_CATALOG
+
+BENCH_DB = "vibesnack_bench"
+
+def make_catalog(num_snacks):
+    # Real documents carry descriptions, images etc. that ranking never reads;
+    # pad them so the projection has something to skip.
+    snacks = []
+    for i in range(num_snacks):
+        base = SNACK_CATALOG[i % len(SNACK_CATALOG)]
+        snack = dict(base, id=i + 1, name=f"{base['name']} #{i + 1}")
+        snack["description"] = "x" * 2048
+        snack["nutrition"] = {f"n{k}": k for k in range(50)}
+        snacks.append(snack)
+    return snacks
+
+def timeit(fn, iterations):
+    for _ in range(min(10, iterations)):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def report(label, result):
+    median, p95 = result
+    print(f"{label:<48} median {median:8.3f} ms   p95 {p95:8.3f} ms")
+
+def run(num_snacks=1000, iterations=200):
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    snacks = db["snacks"]
+    history = db["history"]
+
+    snacks.insert_many(make_catalog(num_snacks))
+    history.insert_one({"_id": HISTORY_ID, "counts": {str(i): i for i in range(1, 200)},
+                        "notes": "y" * 4096})
+
+    print(f"Catalog: {num_snacks} snacks, {iterations} iterations\n")
+
+    print("Catalog read (/predict)")
+    report("  full documents, no index", timeit(lambda: list(snacks.find({}, {"_id": 0})), iterations))
+    report("  projected, no index", timeit(lambda: list(snacks.find({}, SNACK_PROJECTION)), iterations))
+    snacks.create_index([("id", ASCENDING)], unique=True, name="id_unique")
+    snacks.create_index([("tags", ASCENDING)], name="tags")
+    report("  projected, id-ordered via id_unique", timeit(
+        lambda: list(snacks.find({}, SNACK_PROJECTION).sort("id", ASCENDING)), iterations))
+    secondary = db.get_collection("snacks", read_preference=ReadPreference.SECONDARY_PREFERRED)
+    report("  projected, secondaryPreferred", timeit(
+        lambda: list(secondary.find({}, SNACK_PROJECTION).sort("id", ASCENDING)), iterations))
+
+    print("\nHistory read (/predict)")
+    report("  full document", timeit(lambda: history.find_one({"_id": HISTORY_ID}), iterations))
+    report("  counts only", timeit(
+        lambda: history.find_one({"_id": HISTORY_ID}, {"_id": 0, "counts": 1}), iterations))
+
+    print("\nFeedback write (/feedback)")
+    for label, wc in [
+        ("  w=majority, j=True", WriteConcern(w="majority", j=True)),
+        ("  w=1, j=False (default)", WriteConcern(w=1, j=False)),
+    ]:
+        col = db.get_collection("history", write_concern=wc)
+        report(label, timeit(lambda: col.update_one(
+            {"_id": HISTORY_ID}, {"$inc": {"counts.1": 1}}, upsert=True), iterations))
+
+    client.drop_database(BENCH_DB)
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
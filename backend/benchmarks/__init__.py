@@ -0,0 +1,10 @@
+"""
+Micro-benchmarks for the hot functions in model_utils, feature_schema,
+data_generator and train_model.
+
+Run from backend/:
+
+    python -m benchmarks                   # run everything, compare to baseline.json
+    python -m benchmarks --filter predict  # only matching benchmarks
+    python -m benchmarks --save-baseline   # record the current numbers as the baseline
+"""
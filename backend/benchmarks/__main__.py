@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import sys
+from benchmarks import harness
+from benchmarks.suite import BENCHMARKS
+
+HERE = os.path.dirname(__file__)
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+RESULTS_PATH = os.path.join(HERE, "results.json")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="VibeSnack micro-benchmarks")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="flag benchmarks slower than this multiple of the baseline median")
+    parser.add_argument("--quick", action="store_true", help="shorter repeats, noisier numbers")
+    args = parser.parse_args(argv)
+
+    min_seconds = 0.05 if args.quick else harness.MIN_REPEAT_SECONDS
+    repeats = 3 if args.quick else harness.REPEATS
+
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        fn = factory()
+        if fn is None:
+            print(f"Skipping {name}: fixture unavailable")
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = harness.measure(fn, min_seconds, repeats)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    regressions = harness.compare(results, baseline, args.threshold)
+
+    print(harness.format_table(results))
+    with open(RESULTS_PATH, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        # Merge so a filtered run only updates its own entries
+        baseline.update({name: {k: v for k, v in r.items() if k != "vs_baseline"}
+                         for name, r in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}x baseline:")
+        for name in regressions:
+            print(f"  {name}: {results[name]['vs_baseline']:.2f}x")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
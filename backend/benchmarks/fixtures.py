@@ -0,0 +1,59 @@
+import random
+import numpy as np
+from data_generator import SNACK_CATALOG
+from feature_schema import schema, MOODS, DIETS, CONTEXTS
+
+# Synthetic inputs, catalogs and histories at several scales. Everything is
+# seeded so every run benchmarks exactly the same data.
+
+CATALOG_SIZES = [12, 100, 1000, 10000]
+SEED = 1234
+
+def make_catalog(size):
+    """The real 12 snacks, repeated with new ids and names up to `size`."""
+    catalog = []
+    for i in range(size):
+        base = SNACK_CATALOG[i % len(SNACK_CATALOG)]
+        catalog.append(dict(base, id=i + 1, name=f"{base['name']} #{i + 1}"))
+    return catalog
+
+def make_history(catalog, fraction=0.1):
+    """Accept counts for a random `fraction` of the catalog, keyed by str id like Mongo stores them."""
+    rng = random.Random(SEED)
+    picked = rng.sample(catalog, max(1, int(len(catalog) * fraction)))
+    return {str(s["id"]): rng.randint(1, 50) for s in picked}
+
+def make_inputs(n):
+    rng = random.Random(SEED)
+    return [{
+        "hour": rng.randint(0, 23),
+        "mood": rng.choice(MOODS),
+        "hunger": rng.randint(1, 5),
+        "diet": rng.choice(DIETS),
+        "context": rng.choice(CONTEXTS),
+    } for _ in range(n)]
+
+class FixedProbaModel:
+    """
+    Stands in for the classifier when benchmarking predict_snack's own cost at
+    catalog sizes no trained model covers: one class per snack, fixed
+    Dirichlet-distributed probabilities. Tagged with the schema version so
+    predict_snack takes the same feature path as a freshly trained model.
+    """
+    feature_schema_version = schema.VERSION
+
+    def __init__(self, catalog):
+        self.classes_ = np.array([s["id"] for s in catalog])
+        rng = np.random.default_rng(SEED)
+        self._probs = rng.dirichlet(np.ones(len(self.classes_))).reshape(1, -1)
+
+    def predict_proba(self, X):
+        return self._probs
+
+def make_eval_set(n, num_classes=12):
+    """Probabilities, classes and labels shaped like train_model's test split."""
+    rng = np.random.default_rng(SEED)
+    probs = rng.dirichlet(np.ones(num_classes), size=n)
+    classes = np.arange(1, num_classes + 1)
+    y = rng.integers(1, num_classes + 1, size=n)
+    return probs, classes, y
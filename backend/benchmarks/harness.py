@@ -0,0 +1,82 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+# Timing follows timeit: loops are calibrated so one repeat takes at least
+# MIN_REPEAT_SECONDS, GC is off while timing, and the median over REPEATS is
+# reported. Allocations are measured in a separate, untimed call under
+# tracemalloc so they don't skew the timings.
+
+MIN_REPEAT_SECONDS = 0.2
+REPEATS = 7
+
+def _time_loops(fn, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - start
+
+def measure(fn, min_repeat_seconds=MIN_REPEAT_SECONDS, repeats=REPEATS):
+    fn()  # warm caches and lazy imports
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = 1
+        while True:
+            elapsed = _time_loops(fn, loops)
+            if elapsed >= min_repeat_seconds:
+                break
+            loops *= 10 if elapsed < min_repeat_seconds / 10 else 2
+        per_call = [_time_loops(fn, loops) / loops for _ in range(repeats)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "median_us": statistics.median(per_call) * 1e6,
+        "min_us": min(per_call) * 1e6,
+        "spread_pct": (max(per_call) - min(per_call)) / statistics.median(per_call) * 100,
+        "loops": loops,
+        "peak_kib": (peak - before) / 1024,
+        "retained_kib": (after - before) / 1024,
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Returns the names of benchmarks whose median got slower than
+    threshold x their baseline median.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        result["vs_baseline"] = ratio
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def format_table(results):
+    lines = [
+        f"{'benchmark':<46}{'median':>12}{'min':>12}{'spread':>8}{'peak':>11}{'vs base':>9}",
+    ]
+    for name, r in results.items():
+        ratio = f"{r['vs_baseline']:.2f}x" if "vs_baseline" in r else "-"
+        lines.append(
+            f"{name:<46}{r['median_us']:>10.2f}us{r['min_us']:>10.2f}us"
+            f"{r['spread_pct']:>7.1f}%{r['peak_kib']:>8.1f}KiB{ratio:>9}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+import random
+import numpy as np
+import data_generator
+import model_utils
+import train_model
+from feature_schema import schema
+from benchmarks import fixtures
+
+# Each entry maps a benchmark name to a factory that builds the fixtures once
+# and returns the zero-argument callable that gets timed.
+
+def bench_prepare_input():
+    user_input = fixtures.make_inputs(1)[0]
+    return lambda: model_utils.prepare_input(user_input)
+
+def bench_schema_encode():
+    user_input = fixtures.make_inputs(1)[0]
+    return lambda: schema.encode(user_input)
+
+def bench_predict_snack(size):
+    def factory():
+        catalog = fixtures.make_catalog(size)
+        history = fixtures.make_history(catalog)
+        model = fixtures.FixedProbaModel(catalog)
+        user_input = fixtures.make_inputs(1)[0]
+        return lambda: model_utils.predict_snack(model, user_input, catalog, history, top_k=5)
+    return factory
+
+def bench_predict_snack_real_model():
+    model = model_utils.load_model()
+    if model is None:
+        return None
+    catalog = fixtures.make_catalog(12)
+    history = fixtures.make_history(catalog)
+    user_input = fixtures.make_inputs(1)[0]
+    return lambda: model_utils.predict_snack(model, user_input, catalog, history, top_k=5)
+
+def bench_time_encoder(rows):
+    def factory():
+        X = np.array([[i["hour"], i["mood"], i["hunger"], i["diet"], i["context"]]
+                      for i in fixtures.make_inputs(rows)], dtype=object)
+        encoder = model_utils.TimeCategoryEncoder()
+        return lambda: encoder.transform(X)
+    return factory
+
+def _input_snack_pairs(n=100):
+    catalog = fixtures.make_catalog(12)
+    inputs = fixtures.make_inputs(n)
+    return [(user_input, catalog[i % len(catalog)]) for i, user_input in enumerate(inputs)]
+
+def bench_generate_explanation():
+    pairs = _input_snack_pairs()
+    def run():
+        for user_input, snack in pairs:
+            model_utils.generate_explanation(user_input, snack)
+    return run
+
+def bench_format_message():
+    pairs = _input_snack_pairs()
+    def run():
+        for user_input, snack in pairs:
+            model_utils.format_personalized_message(user_input, snack["name"])
+    return run
+
+def bench_generate_data(n):
+    def factory():
+        def run():
+            random.seed(fixtures.SEED)
+            return data_generator.generate_data(n)
+        return run
+    return factory
+
+def bench_top3_eval(n):
+    def factory():
+        probs, classes, y = fixtures.make_eval_set(n)
+        return lambda: train_model.top3_accuracy(probs, classes, y)
+    return factory
+
+BENCHMARKS = {
+    "model_utils.prepare_input": bench_prepare_input,
+    "feature_schema.encode": bench_schema_encode,
+    **{f"model_utils.predict_snack[catalog={n}]": bench_predict_snack(n) for n in fixtures.CATALOG_SIZES},
+    "model_utils.predict_snack[real model]": bench_predict_snack_real_model,
+    **{f"TimeCategoryEncoder.transform[rows={n}]": bench_time_encoder(n) for n in (1000, 100000)},
+    "model_utils.generate_explanation[x100]": bench_generate_explanation,
+    "model_utils.format_personalized_message[x100]": bench_format_message,
+    "data_generator.generate_data[n=1000]": bench_generate_data(1000),
+    **{f"train_model.top3_accuracy[n={n}]": bench_top3_eval(n) for n in (200, 20000)},
+}
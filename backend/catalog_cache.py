@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+import orjson
+import snapshot
+import model_utils
+from database import fetch_catalog, get_catalog_version, breaker
+
+# Pre-serialized, pre-compressed catalog for GET /catalog.
+# The blob is rebuilt only when the catalog version (bumped by
+# seed_db.sync_catalog) changes; the version is checked at most every
+# REFRESH_SECONDS, so most requests never touch the database.
+
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "16384"))
+REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+CACHE_CONTROL = os.getenv(
+    "CATALOG_CACHE_CONTROL", "public, max-age=60, s-maxage=300, stale-while-revalidate=600"
+)
+
+class CatalogBlob:
+    def __init__(self, version, snacks):
+        self.version = version
+        self.body = orjson.dumps({"version": version, "snacks": snacks})
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+        # Strong validators: same bytes, same ETag, on every worker. The gzip
+        # representation has different bytes, so it gets its own tag
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.by_id = {s["id"]: s for s in snacks}
+        # Explanations are only valid for this catalog, so they live and die with it
+        self._explanations = {}
+
+    def explanation(self, user_input, snack):
+        key = (*user_input.values(), snack["id"])
+        text = self._explanations.get(key)
+        if text is None:
+            if len(self._explanations) >= EXPLANATION_CACHE_SIZE:
+                self._explanations.clear()
+            text = self._explanations[key] = model_utils.generate_explanation(user_input, snack)
+        return text
+
+_lock = threading.Lock()
+_blob = None
+_checked_at = None
+
+def get_blob():
+    """
+    Returns the current CatalogBlob, or None if no catalog has ever been
+    available. Falls back to the cached blob or the local snapshot when the
+    database is down.
+    """
+    global _blob, _checked_at
+
+    now = time.monotonic()
+    if _blob is not None and now - _checked_at < REFRESH_SECONDS:
+        return _blob
+
+    with _lock:
+        if _blob is not None and now - _checked_at < REFRESH_SECONDS:
+            return _blob
+        try:
+            # Through the breaker so an outage fails fast instead of holding
+            # _lock for the server selection timeout on every refresh
+            version = breaker.call(get_catalog_version)
+            if _blob is None or version != _blob.version:
+                # Same node as the version read: a lagging secondary would
+                # give an old catalog under the new version's ETag
+                _blob = CatalogBlob(version, breaker.call(fetch_catalog, primary=True))
+        except Exception as e:
+            print(f"Database error: {e}")
+            if _blob is None:
+                cached = snapshot.latest()
+                if cached is None:
+                    return None
+                # Unknown version; the ETag still changes with the content
+                _blob = CatalogBlob(-1, cached[0])
+        _checked_at = now
+        return _blob
+
+def etag_matches(if_none_match, *etags):
+    """True if If-None-Match names any of etags (e.g. either representation of a blob)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return any(tag in etags for tag in candidates)
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip, honouring q-values:
+    "gzip;q=0" (or "*;q=0" without an explicit gzip entry) refuses it.
+    """
+    if not accept_encoding:
+        return False
+    qvalues = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
@@ -18,15 +18,8 @@ SNACK_CATALOG = [
     {"id": 12, "name": "Ice Cream Cup", "tags": ["sweet", "veg", "quick"], "price": "medium", "heavy": False},
 ]
 
-MOODS = ["happy", "sad", "bored", "stressed", "energetic", "lazy"]
-CONTEXTS = ["studying", "gaming", "chilling", "gym", "none"]
-DIETS = ["veg", "non-veg"]
-
-def get_time_category(hour):
-    if 7 <= hour <= 11: return "morning"
-    if 12 <= hour <= 16: return "afternoon"
-    if 17 <= hour <= 20: return "evening"
-    return "night"
+# Vocabularies are shared with training and serving
+from feature_schema import MOODS, CONTEXTS, DIETS, get_time_category
 
 def generate_data(num_samples=1000):
     data = []
@@ -1,13 +1,103 @@
-from pymongo import MongoClient
+import pymongo
+from pymongo import MongoClient, ASCENDING
+from pymongo.read_preferences import ReadPreference
+from pymongo.write_concern import WriteConcern
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "vibesnack"
+# The driver default is 30s, which every request pays while the DB is down
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
 
-client = MongoClient(MONGO_URI)
+# The catalog is written rarely (seed_db) and read on every /predict, so it can
+# be served from secondaries. Feedback counters are cheap to lose, so we don't
+# wait for journal/majority acknowledgement on them.
+CATALOG_READ_PREFERENCE = os.getenv("CATALOG_READ_PREFERENCE", "secondaryPreferred")
+FEEDBACK_WRITE_CONCERN = WriteConcern(
+    w=int(os.getenv("FEEDBACK_WRITE_W", "1")),
+    j=os.getenv("FEEDBACK_WRITE_J", "false").lower() == "true",
+)
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# Only the fields predict_snack / generate_explanation actually read
+SNACK_PROJECTION = {"_id": 0, "id": 1, "name": 1, "tags": 1, "price": 1, "heavy": 1}
+HISTORY_ID = "global_history"
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Stops calling the database after failure_threshold consecutive failures.
+    While open, calls fail immediately; after reset_timeout seconds a single
+    trial call is let through and closes the breaker again if it succeeds.
+    """
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def _allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def _record(self, ok):
+        with self._lock:
+            self._trial_in_flight = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.opened_at is not None or self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        if not self._allow():
+            raise CircuitOpenError("Database circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(False)
+            raise
+        self._record(True)
+        return result
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("DB_BREAKER_THRESHOLD", "3")),
+    reset_timeout=float(os.getenv("DB_BREAKER_RESET_SECONDS", "30")),
+)
+
+client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
 db = client[DB_NAME]
 
 def get_db():
@@ -18,3 +108,72 @@ def get_snacks_collection():
 
 def get_history_collection():
     return db["history"]
+
+def get_meta_collection():
+    return db["meta"]
+
+def get_catalog_read_collection():
+    pref = READ_PREFERENCES.get(CATALOG_READ_PREFERENCE, ReadPreference.PRIMARY)
+    return db.get_collection("snacks", read_preference=pref)
+
+def get_history_write_collection():
+    return db.get_collection("history", write_concern=FEEDBACK_WRITE_CONCERN)
+
+def ensure_indexes():
+    snacks_col = get_snacks_collection()
+    snacks_col.create_index([("id", ASCENDING)], unique=True, name="id_unique")
+    snacks_col.create_index([("tags", ASCENDING)], name="tags")
+
+def fetch_catalog(primary=False):
+    """
+    Returns the snack catalog with only the fields used for ranking,
+    read through the catalog read preference in id order (id_unique index).
+    primary=True reads from the primary, for callers that pair the catalog
+    with get_catalog_version() and must not see an older copy.
+    """
+    col = get_snacks_collection() if primary else get_catalog_read_collection()
+    cursor = col.find({}, SNACK_PROJECTION).sort("id", ASCENDING)
+    return list(cursor)
+
+def fetch_history_counts():
+    # Single _id point lookup; the default _id index is all this query needs
+    doc = get_history_collection().find_one({"_id": HISTORY_ID}, {"_id": 0, "counts": 1})
+    return doc.get("counts", {}) if doc else {}
+
+def record_feedback(snack_id):
+    get_history_write_collection().update_one(
+        {"_id": HISTORY_ID},
+        {"$inc": {f"counts.{snack_id}": 1}},
+        upsert=True
+    )
+
+def fetch_predict_data(timeout=None):
+    """
+    Returns (snack_catalog, user_history) for /predict, guarded by the
+    circuit breaker. Raises CircuitOpenError without touching the network
+    while the database is known to be down. timeout (seconds) bounds both
+    queries together, server selection included.
+    """
+    def fetch():
+        with pymongo.timeout(timeout):
+            return fetch_catalog(), fetch_history_counts()
+    return breaker.call(fetch)
+
+def fetch_predict_catalog(timeout=None):
+    """
+    The catalog alone, for the API's /predict: ranking there uses the re-ranker
+    instead of global history, so history is not fetched. Guarded by the
+    circuit breaker; timeout (seconds) includes server selection.
+    """
+    def fetch():
+        with pymongo.timeout(timeout):
+            return fetch_catalog()
+    return breaker.call(fetch)
+
+def get_catalog_version():
+    """
+    Returns the current catalog version (0 if the catalog was never synced).
+    Bumped by seed_db.sync_catalog whenever the snacks collection changes.
+    """
+    doc = get_meta_collection().find_one({"_id": "catalog"}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
@@ -21,7 +21,8 @@ try:
     }
     
     print("Preparing input...")
-    X = model_utils.prepare_input(user_input)
+    # 'working' is not in feature_schema.CONTEXTS, so its context block stays all-zero
+    X = model_utils.prepare_features(model, user_input)
     print(f"Input shape: {X.shape}")
     print(f"Input content: {X}")
     
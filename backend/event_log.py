@@ -0,0 +1,288 @@
+import atexit
+import os
+import struct
+import threading
+import time
+import numpy as np
+from feature_schema import MOODS, DIETS, CONTEXTS
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is not serialized across processes
+    fcntl = None
+
+# Append-only log of accepted recommendations together with the context they
+# were accepted in. Fixed-size binary records, written in batches by a
+# background thread and fsync'd every FLUSH_INTERVAL seconds.
+#
+# Layout: LOG_DIR/<start_ms>-<pid>-<seq>.open while a worker is writing to it,
+# renamed to .seg once rotated or closed. seq counts the writer's segments, so
+# two rotations in the same millisecond never share a name. Compaction only
+# touches .seg files.
+
+LOG_DIR = os.getenv(
+    "FEEDBACK_LOG_DIR", os.path.join(os.path.dirname(__file__), "feedback_log")
+)
+FLUSH_INTERVAL = float(os.getenv("FEEDBACK_LOG_FLUSH_SECONDS", "2"))
+SEGMENT_BYTES = int(os.getenv("FEEDBACK_LOG_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+# Unwritten events kept in memory while the log can't be written (read-only
+# filesystem, full disk); the oldest are dropped beyond this
+MAX_PENDING_BYTES = int(os.getenv("FEEDBACK_LOG_MAX_PENDING_BYTES", str(4 * 1024 * 1024)))
+
+MAGIC = b"VSEVLOG1"
+UNKNOWN = 255
+
+# ts (unix seconds), snack_id, hour, mood, hunger, diet, context
+RECORD = struct.Struct("<dIBBBBB")
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"), ("snack_id", "<u4"), ("hour", "u1"), ("mood", "u1"),
+    ("hunger", "u1"), ("diet", "u1"), ("context", "u1"),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+MOOD_CODES = {m: i for i, m in enumerate(MOODS)}
+DIET_CODES = {d: i for i, d in enumerate(DIETS)}
+CONTEXT_CODES = {c: i for i, c in enumerate(CONTEXTS)}
+
+def encode_event(snack_id, user_input, ts=None):
+    return RECORD.pack(
+        time.time() if ts is None else ts,
+        snack_id,
+        user_input["hour"],
+        MOOD_CODES.get(user_input["mood"], UNKNOWN),
+        user_input["hunger"],
+        DIET_CODES.get(user_input["diet"], UNKNOWN),
+        CONTEXT_CODES.get(user_input["context"], UNKNOWN),
+    )
+
+class EventLogWriter:
+    def __init__(self, log_dir=LOG_DIR, flush_interval=FLUSH_INTERVAL, segment_bytes=SEGMENT_BYTES,
+                 max_pending_bytes=MAX_PENDING_BYTES):
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def append(self, snack_id, user_input):
+        # Hot path: pack into the in-memory batch, the flusher does the I/O
+        try:
+            record = encode_event(snack_id, user_input)
+        except (struct.error, KeyError, TypeError) as e:
+            print(f"Not logging feedback event: {e}")
+            return False
+        with self._lock:
+            self._buf += record
+        if self._thread is None:
+            self._start()
+        return True
+
+    def _start(self):
+        with self._io_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="event-log-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Feedback log flush failed: {e}")
+
+    def _open_segment(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        while True:
+            self._seq += 1
+            name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._seq:06d}"
+            self._path = os.path.join(self.log_dir, name + ".open")
+            # Sealing renames over <name>.seg, so that name must be free too
+            if os.path.exists(os.path.join(self.log_dir, name + ".seg")):
+                continue
+            # "x": never append to (and later replace) another writer's segment
+            try:
+                self._file = open(self._path, "xb")
+                break
+            except FileExistsError:
+                continue
+        self._size = 0
+        self._file.write(MAGIC)
+        self._size = len(MAGIC)
+
+    def _seal_segment(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._path, self._path[:-len(".open")] + ".seg")
+        self._file = None
+        self._path = None
+
+    def flush(self):
+        with self._lock:
+            if not self._buf:
+                return
+            data = bytes(self._buf)
+            self._buf.clear()
+
+        with self._io_lock:
+            try:
+                if self._file is None:
+                    self._open_segment()
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError:
+                self._requeue(data)
+                self._abandon_segment()
+                raise
+            self._size += len(data)
+            if self._size >= self.segment_bytes:
+                self._seal_segment()
+
+    def _requeue(self, data):
+        """Puts a failed batch back in front of newer events, keeping at most max_pending_bytes."""
+        with self._lock:
+            self._buf[:0] = data
+            excess = len(self._buf) - self.max_pending_bytes
+            if excess > 0:
+                # Drop whole records, oldest first
+                excess = -(-excess // RECORD.size) * RECORD.size
+                del self._buf[:excess]
+                print(f"Feedback log backlog full, dropped {excess // RECORD.size} events")
+
+    def _abandon_segment(self):
+        # The failed batch is requeued, so roll back whatever part of it reached
+        # the file, seal the rest and let the next flush start a new segment
+        if self._file is None:
+            return
+        try:
+            if self._size <= len(MAGIC):
+                self._file.close()
+                os.remove(self._path)
+            else:
+                self._file.truncate(self._size)
+                self._seal_segment()
+        except OSError as e:
+            print(f"Could not seal feedback log segment {self._path}: {e}")
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._path = None
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Feedback log flush failed, {len(self._buf) // RECORD.size} events not written: {e}")
+        with self._io_lock:
+            if self._file is not None:
+                self._seal_segment()
+
+def list_segments(log_dir=LOG_DIR, include_open=True):
+    if not os.path.isdir(log_dir):
+        return []
+    suffixes = (".seg", ".open") if include_open else (".seg",)
+    return sorted(
+        os.path.join(log_dir, name) for name in os.listdir(log_dir) if name.endswith(suffixes)
+    )
+
+def read_segment(path):
+    """
+    Returns the segment's records as a structured numpy array.
+    A torn record at the end (crash mid-write) is ignored.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        print(f"Skipping {path}: not a feedback log segment")
+        return np.empty(0, dtype=RECORD_DTYPE)
+    usable = (len(data) - len(MAGIC)) // RECORD.size * RECORD.size
+    return np.frombuffer(data, dtype=RECORD_DTYPE, count=usable // RECORD.size, offset=len(MAGIC))
+
+def iter_records(log_dir=LOG_DIR, include_open=True):
+    for path in list_segments(log_dir, include_open):
+        records = read_segment(path)
+        if len(records):
+            yield records
+
+def decode_records(records):
+    """
+    Converts records to training rows (hour, mood, hunger, diet, context,
+    snack_id), dropping events with categories the log could not encode.
+    """
+    import pandas as pd
+
+    known = (
+        (records["mood"] != UNKNOWN)
+        & (records["diet"] != UNKNOWN)
+        & (records["context"] != UNKNOWN)
+    )
+    records = records[known]
+    return pd.DataFrame({
+        "hour": records["hour"].astype(np.int64),
+        "mood": np.array(MOODS, dtype=object)[records["mood"]],
+        "hunger": records["hunger"].astype(np.int64),
+        "diet": np.array(DIETS, dtype=object)[records["diet"]],
+        "context": np.array(CONTEXTS, dtype=object)[records["context"]],
+        "snack_id": records["snack_id"].astype(np.int64),
+    })
+
+def load_feedback(log_dir=LOG_DIR):
+    """Stream-reads every segment into one training DataFrame."""
+    import pandas as pd
+
+    frames = [decode_records(records) for records in iter_records(log_dir)]
+    if not frames:
+        return decode_records(np.empty(0, dtype=RECORD_DTYPE))
+    return pd.concat(frames, ignore_index=True)
+
+def compact(log_dir=LOG_DIR):
+    """
+    Merges all sealed segments into a single segment so training reads one
+    file instead of many small ones. Returns the number of segments merged.
+    Holds an exclusive lock on the log directory, so concurrent compactions
+    never merge the same segments twice.
+    """
+    if not os.path.isdir(log_dir):
+        return 0
+    with open(os.path.join(log_dir, ".compact.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return _compact_locked(log_dir)
+
+def _compact_locked(log_dir):
+    segments = list_segments(log_dir, include_open=False)
+    if len(segments) < 2:
+        return 0
+
+    name = f"{int(time.time() * 1000):013d}-{os.getpid()}-compacted"
+    # A compaction in the same millisecond must not replace one of its inputs
+    while os.path.exists(os.path.join(log_dir, name + ".seg")):
+        name += "+"
+    tmp_path = os.path.join(log_dir, name + ".tmp")
+    with open(tmp_path, "wb") as out:
+        out.write(MAGIC)
+        for path in segments:
+            out.write(read_segment(path).tobytes())
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, os.path.join(log_dir, name + ".seg"))
+
+    for path in segments:
+        os.remove(path)
+    return len(segments)
+
+writer = EventLogWriter()
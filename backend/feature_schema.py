@@ -0,0 +1,130 @@
+import threading
+import numpy as np
+
+# The one definition of the model's input features, shared by training,
+# serving, the feedback log and the re-ranker.
+#
+# A request is encoded once into small integer codes (int8), and from there
+# straight into the float32 one-hot row the classifier is fitted on, so no
+# object-dtype arrays or string-matching encoders are involved at predict time.
+# Values outside a vocabulary get code UNKNOWN and an all-zero one-hot block,
+# which is what OneHotEncoder(handle_unknown='ignore') used to do.
+#
+# Vocabulary order is part of the on-disk format of the feedback event log;
+# only ever append to these lists.
+
+MOODS = ["happy", "sad", "bored", "stressed", "energetic", "lazy"]
+CONTEXTS = ["studying", "gaming", "chilling", "gym", "none"]
+DIETS = ["veg", "non-veg"]
+TIME_CATEGORIES = ["morning", "afternoon", "evening", "night"]
+
+HOURS = 24
+HUNGER_MIN, HUNGER_MAX = 1, 5
+UNKNOWN = -1
+
+def get_time_category(hour):
+    if 7 <= hour <= 11: return "morning"
+    if 12 <= hour <= 16: return "afternoon"
+    if 17 <= hour <= 20: return "evening"
+    return "night"
+
+# hour -> time category code
+HOUR_TO_TIME = np.array(
+    [TIME_CATEGORIES.index(get_time_category(h)) for h in range(HOURS)], dtype=np.int8
+)
+
+class FeatureSchema:
+    # Bump when the encoded layout changes; saved on the model so serving
+    # knows whether a model was fitted on this encoding.
+    VERSION = 1
+
+    # Code columns (int8)
+    TIME, MOOD, HUNGER, DIET, CONTEXT = range(5)
+    NUM_CODES = 5
+
+    def __init__(self):
+        self.moods = {m: i for i, m in enumerate(MOODS)}
+        self.diets = {d: i for i, d in enumerate(DIETS)}
+        self.contexts = {c: i for i, c in enumerate(CONTEXTS)}
+
+        # One-hot layout: time | mood | diet | context | hunger (numeric)
+        self.blocks = [
+            (self.TIME, len(TIME_CATEGORIES)),
+            (self.MOOD, len(MOODS)),
+            (self.DIET, len(DIETS)),
+            (self.CONTEXT, len(CONTEXTS)),
+        ]
+        self.offsets = np.cumsum([0] + [size for _, size in self.blocks])[:-1]
+        self.hunger_col = int(sum(size for _, size in self.blocks))
+        self.width = self.hunger_col + 1
+        self.feature_names = (
+            [f"time={v}" for v in TIME_CATEGORIES]
+            + [f"mood={v}" for v in MOODS]
+            + [f"diet={v}" for v in DIETS]
+            + [f"context={v}" for v in CONTEXTS]
+            + ["hunger"]
+        )
+        self._local = threading.local()
+
+    def codes(self, user_input, out=None):
+        """
+        Integer codes for one validated request:
+        [time category, mood, hunger, diet, context] as int8.
+        """
+        if out is None:
+            out = np.empty(self.NUM_CODES, dtype=np.int8)
+        out[self.TIME] = HOUR_TO_TIME[user_input["hour"]]
+        out[self.MOOD] = self.moods.get(user_input["mood"], UNKNOWN)
+        out[self.HUNGER] = user_input["hunger"]
+        out[self.DIET] = self.diets.get(user_input["diet"], UNKNOWN)
+        out[self.CONTEXT] = self.contexts.get(user_input["context"], UNKNOWN)
+        return out
+
+    def encode(self, user_input):
+        """
+        The (1, width) float32 model input for one request. Uses a per-thread
+        preallocated buffer: consume it before encoding the next request.
+        """
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.zeros((1, self.width), dtype=np.float32)
+            self._local.codes = np.empty(self.NUM_CODES, dtype=np.int8)
+        else:
+            buf.fill(0)
+        codes = self.codes(user_input, out=self._local.codes)
+
+        row = buf[0]
+        for (col, _), offset in zip(self.blocks, self.offsets):
+            if codes[col] != UNKNOWN:
+                row[offset + codes[col]] = 1.0
+        row[self.hunger_col] = codes[self.HUNGER]
+        return buf
+
+    def codes_frame(self, df):
+        """Integer codes (n, NUM_CODES) int8 for a DataFrame with the raw feature columns."""
+        out = np.empty((len(df), self.NUM_CODES), dtype=np.int8)
+        out[:, self.TIME] = HOUR_TO_TIME[df["hour"].to_numpy(dtype=np.int64) % HOURS]
+        out[:, self.MOOD] = df["mood"].map(self.moods).fillna(UNKNOWN).to_numpy(dtype=np.int8)
+        out[:, self.HUNGER] = df["hunger"].to_numpy(dtype=np.int8)
+        out[:, self.DIET] = df["diet"].map(self.diets).fillna(UNKNOWN).to_numpy(dtype=np.int8)
+        out[:, self.CONTEXT] = df["context"].map(self.contexts).fillna(UNKNOWN).to_numpy(dtype=np.int8)
+        return out
+
+    def encode_codes(self, codes):
+        """One-hot float32 matrix (n, width) from an int8 code matrix, vectorized."""
+        n = len(codes)
+        X = np.zeros((n, self.width), dtype=np.float32)
+        rows = np.arange(n)
+        for (col, _), offset in zip(self.blocks, self.offsets):
+            known = codes[:, col] != UNKNOWN
+            X[rows[known], offset + codes[known, col]] = 1.0
+        X[:, self.hunger_col] = codes[:, self.HUNGER]
+        return X
+
+    def encode_frame(self, df):
+        return self.encode_codes(self.codes_frame(df))
+
+    def is_fitted_on(self, model):
+        return getattr(model, "feature_schema_version", None) == self.VERSION
+
+schema = FeatureSchema()
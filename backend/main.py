@@ -1,13 +1,32 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Request, Header, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Optional, List
 import model_utils
-from database import get_snacks_collection, get_history_collection
+import snapshot
+import responses
+import event_log
+import profiler
+import hmac
+import hashlib
+import time
+import orjson
+import admission
+import catalog_cache
+import shadow
+import traffic_stats
+from reranker import BanditReranker
+from database import fetch_predict_catalog, record_feedback, breaker
 import uvicorn
 import os
 
-app = FastAPI(title="VibeSnack API", root_path="/api" if os.environ.get("VERCEL") else "")
+app = FastAPI(
+    title="VibeSnack API",
+    root_path="/api" if os.environ.get("VERCEL") else "",
+    default_response_class=ORJSONResponse,
+)
 
 # CORS
 app.add_middleware(
@@ -22,85 +41,348 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request deadlines count from arrival
+app.add_middleware(admission.ArrivalTimeMiddleware)
 
 # Load Model
 model = model_utils.load_model()
+# Online re-ranker over the model's classes, snapshotted in the background
+reranker = BanditReranker(model.classes_).start() if model else None
+admission_control = admission.AdmissionController()
+traffic = traffic_stats.TrafficStats()
+training_profile = traffic_stats.load_training_profile(model_utils.MODEL_PATH)
+# Candidate model scored off the request path (SHADOW_MODEL_PATH), if any
+shadow_eval = shadow.load_shadow(model)
 
+# Validated once here; feature_schema.encode trusts these ranges.
+# Unknown category strings are allowed and encoded as "unknown".
 class UserInput(BaseModel):
-    hour: int
+    hour: int = Field(..., ge=0, le=23)
     mood: str
-    hunger: int
+    hunger: int = Field(..., ge=1, le=5)
     diet: str
     context: str
 
+# Optional per-recommendation fields; id and prob are always returned.
+# Text fields are only generated when requested.
+RESULT_FIELDS = ("name", "tags", "message", "explanation")
+
+class PredictRequest(UserInput):
+    # e.g. ["name", "tags"] for batch consumers; None returns every field
+    include: Optional[List[str]] = None
+
 class Feedback(BaseModel):
     snack_id: int
+    # The input the recommendation was made for; logged as a training event when present
+    hour: Optional[int] = Field(None, ge=0, le=23)
+    mood: Optional[str] = None
+    hunger: Optional[int] = Field(None, ge=1, le=5)
+    diet: Optional[str] = None
+    context: Optional[str] = None
+
+# Same shape as Feedback: the snack that was displayed and the input it was for
+class Impression(Feedback):
+    pass
+
+# Response shapes, documented in the OpenAPI schema only. /predict returns a
+# pre-encoded response, so these are never used to re-validate the output.
+class Recommendation(BaseModel):
+    id: int
+    prob: float
+    # Present unless left out of PredictRequest.include
+    name: Optional[str] = None
+    tags: Optional[List[str]] = None
+    message: Optional[str] = None
+    # None when the response was degraded under load; see GET /explanation
+    explanation: Optional[str] = None
+
+class PredictResponse(BaseModel):
+    recommendations: List[Recommendation]
+    degraded: bool = False
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "database": breaker.state}
 
-@app.post("/predict")
-def predict(input_data: UserInput):
+@app.get("/catalog")
+def get_catalog(request: Request):
+    """
+    The snack catalog as a versioned JSON blob, pre-compressed, with a strong
+    ETag so browsers and the CDN can revalidate with If-None-Match.
+    """
+    blob = catalog_cache.get_blob()
+    if blob is None:
+        raise HTTPException(status_code=503, detail="Catalog unavailable")
+
+    gzipped = catalog_cache.accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": blob.gzip_etag if gzipped else blob.etag,
+        "Cache-Control": catalog_cache.CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    # Either representation is the same catalog, so either tag revalidates
+    if catalog_cache.etag_matches(request.headers.get("if-none-match"), blob.etag, blob.gzip_etag):
+        return Response(status_code=304, headers=headers)
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=blob.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=blob.body, media_type="application/json", headers=headers)
+
+@app.post("/predict", responses={200: {"model": PredictResponse}})
+async def predict(input_data: PredictRequest, request: Request):
     if not model:
         raise HTTPException(status_code=500, detail="Model not loaded")
-    
-    # Fetch data from DB
+
+    include = RESULT_FIELDS if input_data.include is None else tuple(input_data.include)
+    unknown = set(include) - set(RESULT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields in include: {sorted(unknown)}")
+
+    # Validated once by FastAPI; reuse the plain dict everywhere below
+    user_input = input_data.dict(exclude={"include"})
+    traffic.record(user_input)
+
+    # Admission runs on the event loop, before the thread pool. Under overload,
+    # skip the DB and explanations rather than queue forever. Only a cache hit
+    # is served on the loop; a miss runs the model (and may read the snapshot
+    # file), so it goes to the thread pool like everything else.
+    deadline = admission.deadline_for(request)
+    if await admission_control.acquire(deadline) != admission.ADMITTED:
+        results = degraded_cache_hit(user_input)
+        if results is not None:
+            return degraded_response(request, include, results)
+        return await run_in_threadpool(predict_degraded, request, user_input, include)
     try:
-        snacks_col = get_snacks_collection()
-        history_col = get_history_collection()
-        
-        snack_catalog = list(snacks_col.find({}, {"_id": 0}))
-        
-        history_doc = history_col.find_one({"_id": "global_history"})
-        user_history = history_doc.get("counts", {}) if history_doc else {}
+        return await run_in_threadpool(predict_full, request, user_input, include, deadline)
+    finally:
+        admission_control.release()
+
+def format_result(user_input, rec, include):
+    result = {"id": rec['id'], "prob": rec['prob']}
+    if "name" in include:
+        result["name"] = rec['name']
+    if "tags" in include:
+        result["tags"] = rec['tags']
+    if "message" in include:
+        result["message"] = model_utils.format_personalized_message(user_input, rec['name'])
+    if "explanation" in include:
+        result["explanation"] = model_utils.generate_explanation(user_input, rec['snack_details'])
+    return result
+
+def predict_full(request, user_input, include, deadline):
+    # Fetch data from DB, falling back to the last good snapshot if it's down
+    # or can't answer within what is left of the request's deadline
+    try:
+        budget = admission.remaining(deadline)
+        if budget <= 0:
+            raise TimeoutError("Request deadline passed before the database call")
+        snack_catalog = fetch_predict_catalog(timeout=budget)
+        # History is not used here (the re-ranker replaces it), so none is saved
+        snapshot.save(snack_catalog, {})
     except Exception as e:
         print(f"Database error: {e}")
-        # Fallback to empty if DB fails, or raise error
-        # For demo purposes, let's try to load from local json if DB fails as fallback?
-        # But we moved logic to DB. Let's just return error or empty.
-        raise HTTPException(status_code=503, detail="Database unavailable")
+        cached = snapshot.load()
+        if cached is None:
+            raise HTTPException(status_code=503, detail="Database unavailable")
+        snack_catalog = cached[0]
 
     recommendations = model_utils.predict_snack(
         model, 
-        input_data.dict(), 
+        user_input, 
         snack_catalog, 
-        user_history, 
-        top_k=5
+        {}, 
+        top_k=5,
+        reranker=reranker
     )
+    # Impressions are reported by the client for what it actually displays
+    # (POST /impression), so results the user never saw aren't penalized
+    recommended_ids = [rec['id'] for rec in recommendations]
+    traffic.record_recommendations(recommended_ids)
+    if shadow_eval is not None:
+        shadow_eval.submit(user_input)
     
-    # Add messages and explanations
-    results = []
-    for rec in recommendations:
-        msg = model_utils.format_personalized_message(input_data.dict(), rec['name'])
-        explanation = model_utils.generate_explanation(input_data.dict(), rec['snack_details'])
+    # Add only the requested fields; text is generated lazily
+    results = [format_result(user_input, rec, include) for rec in recommendations]
         
-        results.append({
+    return responses.encode(request, {"recommendations": results})
+
+# Degraded answers per input, valid for one catalog. Keyed on the catalog's
+# content: the snapshot hands out a new list object on every save even when
+# only the history changed.
+DEGRADED_CACHE_SIZE = 8192
+# Cache hits are served without re-checking the snapshot for this long
+DEGRADED_RECHECK_SECONDS = float(os.getenv("DEGRADED_RECHECK_SECONDS", "5"))
+_degraded_cache = {"catalog": None, "fingerprint": None, "checked_at": None, "results": {}}
+
+def degraded_cache_hit(user_input):
+    """Cached degraded answer for this input, or None. No I/O, safe on the event loop."""
+    checked_at = _degraded_cache["checked_at"]
+    if checked_at is None or time.monotonic() - checked_at > DEGRADED_RECHECK_SECONDS:
+        return None
+    return _degraded_cache["results"].get(tuple(user_input.values()))
+
+def predict_degraded(request, user_input, include):
+    """
+    Model-only top-k from the last known catalog: no DB round trip, no history
+    or re-ranker boost, no explanations. Cached per input. Sheds with 503 +
+    Retry-After if there is no catalog to serve from. Runs on the thread pool.
+    """
+    cached = snapshot.latest()
+    if cached is None:
+        admission_control.record("shed")
+        raise HTTPException(
+            status_code=503,
+            detail="Server overloaded",
+            headers={"Retry-After": str(admission.RETRY_AFTER_SECONDS)},
+        )
+
+    snack_catalog = cached[0]
+    if _degraded_cache["catalog"] is not snack_catalog:
+        fingerprint = hashlib.sha256(orjson.dumps(snack_catalog)).digest()
+        if fingerprint != _degraded_cache["fingerprint"]:
+            _degraded_cache["results"] = {}
+        _degraded_cache["catalog"] = snack_catalog
+        _degraded_cache["fingerprint"] = fingerprint
+    if len(_degraded_cache["results"]) >= DEGRADED_CACHE_SIZE:
+        _degraded_cache["results"] = {}
+    _degraded_cache["checked_at"] = time.monotonic()
+
+    key = tuple(user_input.values())
+    results = _degraded_cache["results"].get(key)
+    if results is None:
+        recommendations = model_utils.predict_snack(model, user_input, snack_catalog, {}, top_k=5)
+        results = [{
             "id": rec['id'],
             "name": rec['name'],
             "prob": rec['prob'],
             "tags": rec['tags'],
-            "message": msg,
-            "explanation": explanation
-        })
-        
-    return {"recommendations": results}
+            "message": model_utils.format_personalized_message(user_input, rec['name']),
+            "explanation": None
+        } for rec in recommendations]
+        _degraded_cache["results"][key] = results
+    return degraded_response(request, include, results)
+
+def degraded_response(request, include, results):
+    admission_control.record("degraded")
+    traffic.record_recommendations([rec['id'] for rec in results])
+
+    if include != RESULT_FIELDS:
+        keep = {"id", "prob", *include}
+        results = [{k: v for k, v in rec.items() if k in keep} for rec in results]
+    return responses.encode(request, {"recommendations": results, "degraded": True})
+
+@app.get("/explanation")
+def get_explanation(
+    snack_id: int,
+    hour: int = Query(..., ge=0, le=23),
+    mood: str = Query(...),
+    hunger: int = Query(..., ge=1, le=5),
+    diet: str = Query(...),
+    context: str = Query(...),
+):
+    """
+    "Why this snack?" text for one (input, snack) pair, generated on demand.
+    Cached per catalog version, and cacheable by the browser/CDN since it is
+    a pure function of the query string.
+    """
+    blob = catalog_cache.get_blob()
+    if blob is None:
+        raise HTTPException(status_code=503, detail="Catalog unavailable")
+    snack = blob.by_id.get(snack_id)
+    if snack is None:
+        raise HTTPException(status_code=404, detail="Snack not found")
+
+    user_input = {"hour": hour, "mood": mood, "hunger": hunger, "diet": diet, "context": context}
+    explanation = blob.explanation(user_input, snack)
+    return ORJSONResponse(
+        {"snack_id": snack_id, "explanation": explanation},
+        headers={"Cache-Control": catalog_cache.CACHE_CONTROL},
+    )
+
+@app.get("/metrics")
+def metrics():
+    report = {"predict": admission_control.snapshot()}
+    if shadow_eval is not None:
+        report["shadow"] = shadow_eval.snapshot()
+    return report
 
 @app.post("/feedback")
 def submit_feedback(feedback: Feedback):
-    history_col = get_history_collection()
-    
+    user_input = feedback.dict(exclude={"snack_id"})
+    if all(v is not None for v in user_input.values()):
+        event_log.writer.append(feedback.snack_id, user_input)
+    else:
+        user_input = None
+    if reranker is not None:
+        reranker.record_accept(feedback.snack_id, user_input)
+
     # Upsert global history
     # We store counts in a dict under "counts" field
-    sid_str = str(feedback.snack_id)
-    
-    history_col.update_one(
-        {"_id": "global_history"},
-        {"$inc": {f"counts.{sid_str}": 1}},
-        upsert=True
-    )
+    try:
+        breaker.call(record_feedback, str(feedback.snack_id))
+    except Exception as e:
+        print(f"Database error: {e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
     
     return {"status": "success", "message": "Feedback recorded"}
 
+@app.post("/impression")
+def record_impression(impression: Impression):
+    """
+    A recommendation was displayed to the user. Counts as a re-ranker
+    impression for the snack, so its acceptance rate is measured against the
+    times it could actually have been accepted.
+    """
+    user_input = impression.dict(exclude={"snack_id"})
+    if not all(v is not None for v in user_input.values()):
+        user_input = None
+    if reranker is not None:
+        reranker.record_impressions(user_input, [impression.snack_id])
+    return {"status": "success"}
+
+# Functions whose stacks the profiler keeps by default. Everything they call
+# (predict_snack, predict_proba, database calls, generate_explanation) shows up
+# underneath them. /predict's work runs in predict_full / predict_degraded on
+# the thread pool, while the predict coroutine itself sits suspended at an
+# await, so the workers are listed rather than the handler.
+PROFILE_HANDLERS = (
+    "predict (main.py:",
+    "predict_full (main.py:",
+    "predict_degraded (main.py:",
+    "submit_feedback (main.py:",
+)
+
+@app.post("/admin/profile", response_class=PlainTextResponse, include_in_schema=False)
+def profile(
+    seconds: float = 10,
+    all_threads: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Samples this worker for `seconds` and returns collapsed stacks
+    (pipe into flamegraph.pl or load in speedscope).
+    Only available with ENABLE_PROFILER=true and a matching X-Admin-Token.
+    """
+    if not profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", profiler.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    try:
+        stacks = profiler.sample(seconds)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return profiler.format_collapsed(stacks, only=None if all_threads else PROFILE_HANDLERS)
+
+@app.get("/stats/traffic")
+def traffic_report():
+    """
+    Live input distribution of /predict, most recommended snacks, and drift
+    (total variation distance, PSI) against the model's training data.
+    """
+    return traffic.report(training_profile)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -3,14 +3,11 @@ import numpy as np
 import os
 import json
 from sklearn.base import BaseEstimator, TransformerMixin
+from feature_schema import schema, get_time_category
 
-# Define TimeCategoryEncoder class (Must match the one used during training)
-def get_time_category(hour):
-    if 7 <= hour <= 11: return "morning"
-    if 12 <= hour <= 16: return "afternoon"
-    if 17 <= hour <= 20: return "evening"
-    return "night"
-
+# Models trained before feature_schema were full sklearn Pipelines over object
+# arrays. TimeCategoryEncoder and prepare_input are kept so those still load and
+# predict until they are retrained.
 # IMPORTANT: This class name and structure must match exactly what was defined in train_model.py
 class TimeCategoryEncoder(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
@@ -28,6 +25,16 @@ MODEL_PATH = os.path.join(os.path.dirname(__file__), "snack_model.joblib")
 
 
 
+def get_model_version():
+    """
+    Identifies the model file currently on disk (0 if there is none).
+    Changes whenever train_model saves a new model.
+    """
+    try:
+        return os.stat(MODEL_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
 def load_model():
     if os.path.exists(MODEL_PATH):
         try:
@@ -49,33 +56,51 @@ def prepare_input(user_input):
         user_input['context']
     ]], dtype=object)
 
-def predict_snack(model, user_input, snack_catalog, user_history, top_k=3):
+def prepare_features(model, user_input):
+    """
+    Model input for one validated request: the shared float32 encoding for
+    models trained on feature_schema, the legacy object array otherwise.
+    """
+    if schema.is_fitted_on(model):
+        return schema.encode(user_input)
+    return prepare_input(user_input)
+
+def predict_snack(model, user_input, snack_catalog, user_history, top_k=3, reranker=None):
     """
     Returns top_k snack IDs and their probabilities.
     snack_catalog: list of snack dicts
     user_history: dict of snack_id -> count
+    reranker: optional BanditReranker; replaces the global history boost
     """
-    df = prepare_input(user_input)
+    X = prepare_features(model, user_input)
     
     # Get probabilities
-    probs = model.predict_proba(df)[0]
+    probs = model.predict_proba(X)[0]
     classes = model.classes_
+
+    # Ranking scores start from the model probabilities; adjustments only
+    # change the order, "prob" stays the model's own confidence
+    scores = probs
+    if reranker is not None:
+        # Online feedback stats for this context, one vectorized add
+        scores = probs + reranker.adjustment(user_input)
     
-    # Create a dict of snack_id -> prob
+    # Create dicts of snack_id -> prob / score
     prob_dict = {cls: prob for cls, prob in zip(classes, probs)}
+    score_dict = {cls: score for cls, score in zip(classes, scores)}
     
     # Boost from history
-    total_history = sum(user_history.values())
+    total_history = sum(user_history.values()) if reranker is None else 0
     if total_history > 0:
         for sid, count in user_history.items():
             sid = int(sid)
-            if sid in prob_dict:
+            if sid in score_dict:
                 # Small boost: 1% per accept, capped at 10%
                 boost = min(0.1, (count / total_history) * 0.2) 
-                prob_dict[sid] += boost
+                score_dict[sid] += boost
     
     # Sort
-    sorted_snacks = sorted(prob_dict.items(), key=lambda x: x[1], reverse=True)
+    sorted_snacks = sorted(score_dict.items(), key=lambda x: x[1], reverse=True)
     
     top_k_snacks = []
     
@@ -89,7 +114,8 @@ def predict_snack(model, user_input, snack_catalog, user_history, top_k=3):
                 return s
         return None
 
-    for sid, prob in sorted_snacks:
+    for sid, _ in sorted_snacks:
+        prob = prob_dict[sid]
         sid = int(sid) # Convert numpy int64 to native int
         snack = get_snack(sid)
         if snack:
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# On-demand sampling profiler for a live worker.
+# Nothing runs until a profile is requested: a sampler thread then reads
+# every other thread's stack with sys._current_frames() at a fixed interval
+# and the samples are returned as collapsed stacks
+# ("frame;frame;frame count" per line), the input format of flamegraph.pl
+# and speedscope.
+
+ENABLED = os.getenv("ENABLE_PROFILER", "false").lower() == "true"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_SECONDS = 60.0
+
+_running = threading.Lock()
+
+class ProfilerBusy(Exception):
+    pass
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+def sample(seconds, interval=0.005):
+    """
+    Samples all threads except the sampler for the given number of seconds.
+    Returns a Counter of collapsed stack -> sample count.
+    Raises ProfilerBusy if another profile is already running.
+    """
+    seconds = min(float(seconds), MAX_SECONDS)
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread = names.get(ident, f"thread-{ident}")
+                stacks[f"{thread};{_collapse(frame)}"] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _running.release()
+
+def format_collapsed(stacks, only=None):
+    """
+    Renders the samples one stack per line, heaviest first.
+    only: optional frame labels ("name (file.py:"); keeps stacks with a frame
+    starting with any of them. Whole frames are matched, so "predict (" does
+    not also pick up "predict_full (".
+    """
+    lines = []
+    for stack, count in stacks.most_common():
+        if only and not any(frame.startswith(only) for frame in stack.split(";")[1:]):
+            continue
+        lines.append(f"{stack} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,216 @@
+import atexit
+import os
+import tempfile
+import threading
+import numpy as np
+from feature_schema import MOODS, DIETS, CONTEXTS, TIME_CATEGORIES, get_time_category
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized across workers
+    fcntl = None
+
+# Online re-ranking on top of the model's predict_proba output.
+# For every context bucket we keep, per snack (arm), how often it was displayed
+# to a user (reported by the client via /impression) and how often it was
+# accepted. Updates are O(1) array increments;
+# ranking adds a vectorized adjustment to the model probabilities, so
+# feedback changes recommendations immediately, without retraining.
+#
+# Every worker process keeps its own copy. On each snapshot a worker merges the
+# counts it gathered since its last snapshot into the shared state file (under
+# a file lock) and reloads the merged totals, so workers converge on the same
+# stats every SNAPSHOT_INTERVAL seconds instead of overwriting each other.
+
+STATE_PATH = os.getenv(
+    "RERANKER_STATE_PATH", os.path.join(os.path.dirname(__file__), "reranker_state.npz")
+)
+SNAPSHOT_INTERVAL = float(os.getenv("RERANKER_SNAPSHOT_SECONDS", "60"))
+
+# Max amount added to / removed from a probability
+WEIGHT = float(os.getenv("RERANKER_WEIGHT", "0.15"))
+# Pseudo-impressions at the row's mean acceptance rate that every arm starts with
+PRIOR_SHOWS = 5.0
+# Impressions needed before a bucket's own stats count as much as the global ones
+CONFIDENCE_SHOWS = 20.0
+
+HUNGER_LEVELS = 3  # low (1-2), medium (3), high (4-5)
+
+def _index(values):
+    return {v: i for i, v in enumerate(values)}
+
+_TIME_IDX = _index(TIME_CATEGORIES)
+# The last slot of each dimension holds unknown values
+_MOOD_IDX = _index(MOODS)
+_DIET_IDX = _index(DIETS)
+_CONTEXT_IDX = _index(CONTEXTS)
+BUCKET_SHAPE = (
+    len(TIME_CATEGORIES), len(MOODS) + 1, HUNGER_LEVELS, len(DIETS) + 1, len(CONTEXTS) + 1
+)
+NUM_BUCKETS = int(np.prod(BUCKET_SHAPE))
+
+def hunger_level(hunger):
+    if hunger <= 2: return 0
+    if hunger == 3: return 1
+    return 2
+
+def context_bucket(user_input):
+    return int(np.ravel_multi_index((
+        _TIME_IDX[get_time_category(user_input["hour"])],
+        _MOOD_IDX.get(user_input["mood"], len(MOODS)),
+        hunger_level(user_input["hunger"]),
+        _DIET_IDX.get(user_input["diet"], len(DIETS)),
+        _CONTEXT_IDX.get(user_input["context"], len(CONTEXTS)),
+    ), BUCKET_SHAPE))
+
+class BanditReranker:
+    def __init__(self, classes, state_path=STATE_PATH):
+        self.classes = np.asarray(classes)
+        self.arm_index = {int(c): i for i, c in enumerate(self.classes)}
+        self.state_path = state_path
+        # Row NUM_BUCKETS aggregates every bucket (and feedback without input)
+        self.shows = np.zeros((NUM_BUCKETS + 1, len(self.classes)), dtype=np.float64)
+        self.accepts = np.zeros_like(self.shows)
+        # Counts not yet merged into the state file
+        self._new_shows = np.zeros_like(self.shows)
+        self._new_accepts = np.zeros_like(self.shows)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self.load()
+
+    def start(self, interval=SNAPSHOT_INTERVAL):
+        """Snapshots the state every interval seconds (and at exit) from a background thread."""
+        def run():
+            while not self._stop.wait(interval):
+                if self._dirty:
+                    self.save()
+        threading.Thread(target=run, name="reranker-snapshot", daemon=True).start()
+        atexit.register(self.close)
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._dirty:
+            self.save()
+
+    def _rows(self, user_input):
+        if user_input is None:
+            return (NUM_BUCKETS,)
+        return (context_bucket(user_input), NUM_BUCKETS)
+
+    def record_impressions(self, user_input, snack_ids):
+        arms = [self.arm_index[sid] for sid in snack_ids if sid in self.arm_index]
+        with self._lock:
+            for row in self._rows(user_input):
+                self.shows[row, arms] += 1
+                self._new_shows[row, arms] += 1
+            self._dirty = True
+
+    def record_accept(self, snack_id, user_input=None):
+        arm = self.arm_index.get(int(snack_id))
+        if arm is None:
+            return
+        with self._lock:
+            for row in self._rows(user_input):
+                self.accepts[row, arm] += 1
+                self._new_accepts[row, arm] += 1
+                # Feedback on an arm we never counted as shown still needs a denominator
+                if self.shows[row, arm] < self.accepts[row, arm]:
+                    self._new_shows[row, arm] += self.accepts[row, arm] - self.shows[row, arm]
+                    self.shows[row, arm] = self.accepts[row, arm]
+            self._dirty = True
+
+    def _lift(self, row):
+        """
+        Per-arm acceptance lift over the row's own mean acceptance rate, in
+        [-1, 1]. Zero for every arm until the row has seen an accept, so plain
+        traffic with no feedback never moves the ranking.
+        """
+        shows = self.shows[row]
+        accepts = self.accepts[row]
+        total_accepts = accepts.sum()
+        if total_accepts == 0:
+            return np.zeros_like(shows)
+        mean_rate = total_accepts / shows.sum()
+        # Arms with few impressions are shrunk toward the mean
+        rate = (accepts + PRIOR_SHOWS * mean_rate) / (shows + PRIOR_SHOWS)
+        confidence = shows / (shows + CONFIDENCE_SHOWS)
+        return np.clip((rate - mean_rate) / mean_rate, -1.0, 1.0) * confidence
+
+    def adjustment(self, user_input):
+        """
+        Returns an array aligned with model.classes_ to add to predict_proba
+        output for ranking. The context bucket's lift is blended with the global
+        lift by how much data the bucket has.
+        """
+        bucket = context_bucket(user_input)
+        global_lift = self._lift(NUM_BUCKETS)
+        bucket_lift = self._lift(bucket)
+        bucket_shows = self.shows[bucket].sum()
+        share = bucket_shows / (bucket_shows + CONFIDENCE_SHOWS)
+        return WEIGHT * (share * bucket_lift + (1 - share) * global_lift)
+
+    def _read_state(self):
+        """(shows, accepts) from the state file, or None if missing or for another model."""
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            with np.load(self.state_path) as state:
+                if (not np.array_equal(state["classes"], self.classes)
+                        or tuple(state["bucket_shape"]) != BUCKET_SHAPE):
+                    print("Reranker state is for a different model, starting fresh.")
+                    return None
+                return state["shows"].astype(np.float64), state["accepts"].astype(np.float64)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load reranker state: {e}")
+            return None
+
+    def save(self):
+        """Merges this worker's new counts into the state file and reloads the totals."""
+        with self._lock:
+            new_shows, new_accepts = self._new_shows.copy(), self._new_accepts.copy()
+            self._new_shows.fill(0)
+            self._new_accepts.fill(0)
+            self._dirty = False
+
+        state_dir = os.path.dirname(os.path.abspath(self.state_path))
+        try:
+            with open(f"{self.state_path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                stored = self._read_state()
+                if stored is None:
+                    shows, accepts = new_shows, new_accepts
+                else:
+                    shows, accepts = stored[0] + new_shows, stored[1] + new_accepts
+
+                # Per-worker temp file, renamed into place while holding the lock
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=state_dir, prefix=os.path.basename(self.state_path) + ".", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        np.savez(f, classes=self.classes, shows=shows, accepts=accepts,
+                                 bucket_shape=np.array(BUCKET_SHAPE))
+                    os.replace(tmp_path, self.state_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+        except OSError as e:
+            print(f"Could not save reranker state: {e}")
+            # Keep the counts for the next attempt
+            with self._lock:
+                self._new_shows += new_shows
+                self._new_accepts += new_accepts
+                self._dirty = True
+            return
+
+        with self._lock:
+            # Merged totals plus whatever arrived while we were writing
+            self.shows = shows + self._new_shows
+            self.accepts = accepts + self._new_accepts
+
+    def load(self):
+        stored = self._read_state()
+        if stored is not None:
+            self.shows, self.accepts = stored
@@ -0,0 +1,29 @@
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+# MessagePack is optional; internal clients opt in with an Accept header
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def wants_msgpack(request: Request):
+    accept = request.headers.get("accept", "")
+    return any(t in accept for t in MSGPACK_TYPES)
+
+def encode(request: Request, payload, status_code=200, headers=None):
+    """
+    Serializes an already-built payload of plain dicts/lists.
+    Skips FastAPI's jsonable_encoder pass: orjson by default, MessagePack
+    when the client asks for it and msgpack is installed.
+    """
+    if msgpack is not None and wants_msgpack(request):
+        return Response(
+            content=msgpack.packb(payload, use_bin_type=True),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/msgpack",
+        )
+    return ORJSONResponse(payload, status_code=status_code, headers=headers)
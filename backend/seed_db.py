@@ -1,28 +1,180 @@
 import json
-from database import get_snacks_collection
+import sys
+from datetime import datetime, timezone
+from pymongo import ReplaceOne, DeleteOne, ReturnDocument
+from database import get_snacks_collection, get_meta_collection, ensure_indexes
 
-def seed_snacks():
+CATALOG_PATH = "snack_catalog.json"
+BATCH_SIZE = 500
+READ_CHUNK = 64 * 1024
+
+def iter_catalog(path, chunk_size=READ_CHUNK):
+    """
+    Streams snack dicts out of a top-level JSON array without loading the
+    whole file. Each element is decoded as soon as it is complete in the buffer.
+    Strict about the array's shape (objects separated by exactly one comma,
+    nothing after the closing bracket), since --prune deletes every snack the
+    file doesn't mention.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    # What comes next: "[", first element or "]", element, "," or "]", end of file
+    expect = "open"
+    eof = False
+
+    with open(path, "r") as f:
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+
+            if pos < len(buf):
+                char = buf[pos]
+                if expect == "open":
+                    if char != "[":
+                        raise ValueError(f"{path}: expected a JSON array of snacks")
+                    expect, pos = "first", pos + 1
+                    continue
+                if expect == "end":
+                    raise ValueError(f"{path}: unexpected data after the snack array")
+                if expect == "separator":
+                    if char == ",":
+                        expect, pos = "element", pos + 1
+                    elif char == "]":
+                        expect, pos = "end", pos + 1
+                    else:
+                        raise ValueError(f"{path}: expected ',' or ']' between snacks")
+                    continue
+                if expect == "first" and char == "]":
+                    expect, pos = "end", pos + 1
+                    continue
+                # Objects only: they end with "}", so a complete one is never
+                # a prefix cut at a chunk boundary (unlike a number)
+                if char != "{":
+                    raise ValueError(f"{path}: snack entries must be JSON objects")
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Element is incomplete, read more unless we're at the end
+                    if eof:
+                        raise
+                else:
+                    yield obj
+                    expect, pos = "separator", end
+                    continue
+
+            if eof:
+                if expect == "end":
+                    return
+                if expect == "open":
+                    raise ValueError(f"{path}: expected a JSON array of snacks")
+                raise ValueError(f"{path}: unterminated JSON array")
+
+            # Drop consumed text and pull in the next chunk
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+def bump_catalog_version(meta_col, changes):
+    doc = meta_col.find_one_and_update(
+        {"_id": "catalog"},
+        {
+            "$inc": {"version": 1},
+            "$set": {
+                "updated_at": datetime.now(timezone.utc),
+                "last_changes": changes,
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+def sync_catalog(path=CATALOG_PATH, batch_size=BATCH_SIZE, prune=False):
+    """
+    Incrementally syncs the catalog file into MongoDB.
+    Only new or changed snacks are written (unordered bulk upserts, in batches).
+    If prune is True, snacks missing from the file are deleted.
+    Returns a dict of change counts.
+    """
     snacks_col = get_snacks_collection()
-    
-    # Check if already seeded
-    if snacks_col.count_documents({}) > 0:
-        print("Database already seeded.")
-        return
+    ensure_indexes()
+
+    seen = set()
+    batch = []
+    ops = []
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
 
+    def flush():
+        if ops:
+            snacks_col.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    def sync_batch():
+        # Diff one batch of the file against just the matching documents
+        # (id_unique index): only batch_size full documents are held at once.
+        # The ids in `seen` are still O(catalog), for duplicates and pruning.
+        existing = {
+            doc["id"]: doc
+            for doc in snacks_col.find({"id": {"$in": [s["id"] for s in batch]}}, {"_id": 0})
+        }
+        for snack in batch:
+            current = existing.get(snack["id"])
+            if current == snack:
+                counts["unchanged"] += 1
+                continue
+            counts["inserted" if current is None else "updated"] += 1
+            ops.append(ReplaceOne({"id": snack["id"]}, snack, upsert=True))
+        batch.clear()
+        flush()
+
+    for snack in iter_catalog(path):
+        sid = snack["id"]
+        if sid in seen:
+            print(f"Duplicate snack id {sid} in {path}, keeping the first entry.")
+            continue
+        seen.add(sid)
+        batch.append(snack)
+        if len(batch) >= batch_size:
+            sync_batch()
+    if batch:
+        sync_batch()
+
+    if prune:
+        # Ids only: covered by the id_unique index
+        for doc in snacks_col.find({}, {"_id": 0, "id": 1}):
+            if doc["id"] not in seen:
+                ops.append(DeleteOne({"id": doc["id"]}))
+                counts["deleted"] += 1
+                if len(ops) >= batch_size:
+                    flush()
+
+    flush()
+
+    if counts["inserted"] or counts["updated"] or counts["deleted"]:
+        counts["version"] = bump_catalog_version(get_meta_collection(), dict(counts))
+    return counts
+
+def seed_snacks(path=CATALOG_PATH, prune=False):
     try:
-        with open("snack_catalog.json", "r") as f:
-            snacks = json.load(f)
-            
-        if snacks:
-            snacks_col.insert_many(snacks)
-            print(f"Seeded {len(snacks)} snacks into MongoDB.")
-        else:
-            print("No snacks found in snack_catalog.json")
-            
+        counts = sync_catalog(path, prune=prune)
     except FileNotFoundError:
-        print("snack_catalog.json not found.")
+        print(f"{path} not found.")
+        return
     except Exception as e:
         print(f"Error seeding database: {e}")
+        return
+
+    if "version" in counts:
+        print(
+            f"Catalog synced to version {counts['version']}: "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, "
+            f"{counts['deleted']} deleted, {counts['unchanged']} unchanged."
+        )
+    else:
+        print(f"Catalog already up to date ({counts['unchanged']} snacks).")
 
 if __name__ == "__main__":
-    seed_snacks()
+    args = [a for a in sys.argv[1:] if a != "--prune"]
+    seed_snacks(args[0] if args else CATALOG_PATH, prune="--prune" in sys.argv)
@@ -0,0 +1,113 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+import joblib
+import numpy as np
+import model_utils
+
+# Shadow evaluation of a candidate model on live /predict traffic.
+# The request thread only samples and does a non-blocking put onto a bounded
+# queue (dropping when full); a worker thread scores the primary and candidate
+# models on the same input and records how much they agree.
+
+CANDIDATE_PATH = os.getenv("SHADOW_MODEL_PATH")
+SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+TOP_K = 5
+LATENCY_WINDOW = 1000
+
+class ShadowEvaluator:
+    def __init__(self, primary, candidate, sample_rate=SAMPLE_RATE, queue_size=QUEUE_SIZE):
+        self.primary = primary
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.stats = {
+            "scored": 0, "dropped": 0, "errors": 0,
+            "top1_agree": 0, "topk_overlap_sum": 0.0, "prob_delta_sum": 0.0,
+        }
+        self._latency = {"primary": deque(maxlen=LATENCY_WINDOW), "candidate": deque(maxlen=LATENCY_WINDOW)}
+        threading.Thread(target=self._run, name="shadow-evaluator", daemon=True).start()
+
+    def submit(self, user_input):
+        """Called on the request path: never blocks, drops when sampled out or full."""
+        if random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait(dict(user_input))
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+
+    def _score(self, model, user_input):
+        start = time.perf_counter()
+        probs = model.predict_proba(model_utils.prepare_features(model, user_input))[0]
+        elapsed = (time.perf_counter() - start) * 1000
+        return dict(zip((int(c) for c in model.classes_), probs)), elapsed
+
+    def _compare(self, user_input):
+        primary, primary_ms = self._score(self.primary, user_input)
+        candidate, candidate_ms = self._score(self.candidate, user_input)
+
+        primary_top = sorted(primary, key=primary.get, reverse=True)[:TOP_K]
+        candidate_top = sorted(candidate, key=candidate.get, reverse=True)[:TOP_K]
+        overlap = len(set(primary_top) & set(candidate_top)) / TOP_K
+        # Mean absolute difference over every class either model knows
+        ids = primary.keys() | candidate.keys()
+        delta = float(np.mean([abs(primary.get(i, 0.0) - candidate.get(i, 0.0)) for i in ids]))
+
+        with self._lock:
+            self.stats["scored"] += 1
+            self.stats["top1_agree"] += primary_top[0] == candidate_top[0]
+            self.stats["topk_overlap_sum"] += overlap
+            self.stats["prob_delta_sum"] += delta
+            self._latency["primary"].append(primary_ms)
+            self._latency["candidate"].append(candidate_ms)
+
+    def _run(self):
+        while True:
+            user_input = self._queue.get()
+            try:
+                self._compare(user_input)
+            except Exception as e:
+                print(f"Shadow scoring failed: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            latency = {name: list(values) for name, values in self._latency.items()}
+        scored = stats["scored"] or 1
+        report = {
+            "scored": stats["scored"],
+            "dropped": stats["dropped"],
+            "errors": stats["errors"],
+            "queued": self._queue.qsize(),
+            "top1_agreement": stats["top1_agree"] / scored,
+            f"top{TOP_K}_overlap": stats["topk_overlap_sum"] / scored,
+            "mean_abs_prob_delta": stats["prob_delta_sum"] / scored,
+        }
+        for name, values in latency.items():
+            if values:
+                report[f"{name}_latency_ms"] = {
+                    "p50": float(np.percentile(values, 50)),
+                    "p95": float(np.percentile(values, 95)),
+                }
+        return report
+
+def load_shadow(primary, path=CANDIDATE_PATH):
+    """Returns a running ShadowEvaluator if SHADOW_MODEL_PATH points at a loadable model."""
+    if not path or primary is None:
+        return None
+    try:
+        candidate = joblib.load(path)
+    except Exception as e:
+        print(f"Shadow model not loaded from {path}: {e}")
+        return None
+    print(f"Shadow evaluating {path} on {SAMPLE_RATE:.0%} of /predict traffic")
+    return ShadowEvaluator(primary, candidate)
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Last known good catalog + history, used by /predict while MongoDB is down.
+# Override SNAPSHOT_PATH on read-only deployments (e.g. /tmp on Vercel).
+SNAPSHOT_PATH = os.getenv(
+    "SNAPSHOT_PATH", os.path.join(os.path.dirname(__file__), "db_snapshot.json")
+)
+# Minimum seconds between snapshot writes
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+
+_lock = threading.Lock()
+_last_saved = None
+_last_saved_at = None
+_loaded = None
+_loaded_mtime = None
+
+def save(snack_catalog, user_history, path=SNAPSHOT_PATH):
+    """
+    Persists the catalog and history if they changed and the last write is
+    older than SNAPSHOT_INTERVAL. Written to a per-process temp file and
+    renamed so a reader never sees a half-written or interleaved snapshot.
+    """
+    global _last_saved, _last_saved_at
+
+    now = time.monotonic()
+    if _last_saved_at is not None and now - _last_saved_at < SNAPSHOT_INTERVAL:
+        return False
+    if not _lock.acquire(blocking=False):
+        return False  # another request is already writing it
+    try:
+        _last_saved_at = now
+        if _last_saved == (snack_catalog, user_history):
+            return False
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + "."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({
+                    "saved_at": time.time(),
+                    "catalog": snack_catalog,
+                    "history": user_history,
+                }, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        _last_saved = (snack_catalog, user_history)
+        return True
+    except OSError as e:
+        print(f"Could not write snapshot: {e}")
+        return False
+    finally:
+        _lock.release()
+
+def load(path=SNAPSHOT_PATH):
+    """
+    Returns (snack_catalog, user_history) from the snapshot, or None if there
+    is no usable snapshot. The file is only re-read when it changes on disk.
+    """
+    global _loaded, _loaded_mtime
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if _loaded is not None and mtime == _loaded_mtime:
+        return _loaded
+
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError) as e:
+        print(f"Could not read snapshot: {e}")
+        return None
+
+    _loaded = (data.get("catalog", []), data.get("history", {}))
+    _loaded_mtime = mtime
+    return _loaded
+
+def latest():
+    """
+    The most recent known good (snack_catalog, user_history) without touching
+    the database: what this process last saved, else the snapshot on disk.
+    """
+    if _last_saved is not None:
+        return _last_saved
+    return load()
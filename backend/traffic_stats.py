@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import numpy as np
+from feature_schema import schema, MOODS, DIETS, CONTEXTS, HOURS, HUNGER_MIN, HUNGER_MAX, UNKNOWN
+
+# Constant-memory statistics of the traffic hitting /predict, compared against
+# the distribution the model was trained on.
+#
+# Categorical features are fixed-size counter arrays (the last slot counts
+# values outside the vocabulary), hours a 24-bin histogram, and recommended
+# snack ids a Space-Saving heavy-hitters sketch. Recording a request is a
+# handful of array increments.
+
+HEAVY_HITTERS = int(os.getenv("TRAFFIC_HEAVY_HITTERS", "32"))
+
+FEATURES = {
+    "hour": [str(h) for h in range(HOURS)],
+    "mood": MOODS + ["<unknown>"],
+    "hunger": [str(h) for h in range(HUNGER_MIN, HUNGER_MAX + 1)],
+    "diet": DIETS + ["<unknown>"],
+    "context": CONTEXTS + ["<unknown>"],
+}
+
+class SpaceSaving:
+    """
+    Top-k frequent items in fixed memory (Metwally et al.). Counts are upper
+    bounds; `error` is how much of a count may belong to evicted items.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item):
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = 1
+            self.errors[item] = 0
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.counts[item] = floor + 1
+            self.errors[item] = floor
+
+    def top(self, n=None):
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [{"id": item, "count": count, "error": self.errors[item]} for item, count in items]
+
+class TrafficStats:
+    def __init__(self, heavy_hitters=HEAVY_HITTERS):
+        self._lock = threading.Lock()
+        self._codes = np.empty(schema.NUM_CODES, dtype=np.int8)
+        self.requests = 0
+        self.hours = np.zeros(HOURS, dtype=np.int64)
+        self.moods = np.zeros(len(MOODS) + 1, dtype=np.int64)
+        self.hunger = np.zeros(HUNGER_MAX - HUNGER_MIN + 1, dtype=np.int64)
+        self.diets = np.zeros(len(DIETS) + 1, dtype=np.int64)
+        self.contexts = np.zeros(len(CONTEXTS) + 1, dtype=np.int64)
+        self.snacks = SpaceSaving(heavy_hitters)
+
+    def record(self, user_input):
+        with self._lock:
+            codes = schema.codes(user_input, out=self._codes)
+            self.requests += 1
+            self.hours[user_input["hour"]] += 1
+            # UNKNOWN (-1) lands in the last slot
+            self.moods[codes[schema.MOOD]] += 1
+            self.hunger[codes[schema.HUNGER] - HUNGER_MIN] += 1
+            self.diets[codes[schema.DIET]] += 1
+            self.contexts[codes[schema.CONTEXT]] += 1
+
+    def record_recommendations(self, snack_ids):
+        with self._lock:
+            for sid in snack_ids:
+                self.snacks.add(sid)
+
+    def counts(self):
+        with self._lock:
+            return {
+                "hour": self.hours.tolist(),
+                "mood": self.moods.tolist(),
+                "hunger": self.hunger.tolist(),
+                "diet": self.diets.tolist(),
+                "context": self.contexts.tolist(),
+            }
+
+    def report(self, training=None):
+        live = self.counts()
+        report = {"requests": self.requests, "features": {}, "top_snacks": self.snacks.top(10)}
+        for name, values in live.items():
+            feature = {"live": dict(zip(FEATURES[name], values))}
+            if training and name in training:
+                feature["training"] = dict(zip(FEATURES[name], training[name]))
+                feature.update(drift(values, training[name]))
+            report["features"][name] = feature
+        return report
+
+def drift(live, expected, eps=1e-6):
+    """Total variation distance and population stability index between two count vectors."""
+    p = np.asarray(live, dtype=np.float64)
+    q = np.asarray(expected, dtype=np.float64)
+    if p.sum() == 0 or q.sum() == 0:
+        return {"tvd": None, "psi": None}
+    p, q = p / p.sum(), q / q.sum()
+    tvd = 0.5 * np.abs(p - q).sum()
+    p_s, q_s = np.clip(p, eps, None), np.clip(q, eps, None)
+    psi = ((p_s - q_s) * np.log(p_s / q_s)).sum()
+    return {"tvd": float(tvd), "psi": float(psi)}
+
+def training_profile(df):
+    """Per-feature counts of a training DataFrame, in the same layout as TrafficStats.counts."""
+    codes = schema.codes_frame(df)
+    hours = df["hour"].to_numpy(dtype=np.int64) % HOURS
+
+    def histogram(values, size):
+        return np.bincount(values, minlength=size)[:size].tolist()
+
+    return {
+        "hour": histogram(hours, HOURS),
+        "mood": histogram(np.where(codes[:, schema.MOOD] == UNKNOWN, len(MOODS), codes[:, schema.MOOD]), len(MOODS) + 1),
+        "hunger": histogram(np.clip(codes[:, schema.HUNGER], HUNGER_MIN, HUNGER_MAX) - HUNGER_MIN, HUNGER_MAX - HUNGER_MIN + 1),
+        "diet": histogram(np.where(codes[:, schema.DIET] == UNKNOWN, len(DIETS), codes[:, schema.DIET]), len(DIETS) + 1),
+        "context": histogram(np.where(codes[:, schema.CONTEXT] == UNKNOWN, len(CONTEXTS), codes[:, schema.CONTEXT]), len(CONTEXTS) + 1),
+    }
+
+def profile_path(model_path):
+    return f"{model_path}.stats.json"
+
+def save_training_profile(df, model_path):
+    with open(profile_path(model_path), "w") as f:
+        json.dump(training_profile(df), f)
+
+def load_training_profile(model_path):
+    try:
+        with open(profile_path(model_path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -3,89 +3,179 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, confusion_matrix
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.pipeline import Pipeline
 import joblib
+import os
+import tempfile
 import model_utils # Import our utils
+from feature_schema import schema
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "snack_data.csv")
 
 # Load Data
-def load_data():
+def load_data(path=DATA_PATH):
     try:
-        return pd.read_csv("snack_data.csv")
+        return pd.read_csv(path)
     except FileNotFoundError:
         print("Data not found. Generating new data...")
         import data_generator
-        data_generator.generate_data()
-        return pd.read_csv("snack_data.csv")
+        df = data_generator.generate_data()
+        df.to_csv(path, index=False)
+        return df
 
 
 
-def train():
-    print("Loading data...")
-    df = load_data()
-    
-    # Features and Target
-    # Order: hour(0), mood(1), hunger(2), diet(3), context(4)
-    X = df[['hour', 'mood', 'hunger', 'diet', 'context']].values
-    y = df['snack_id'].values
-    
-    # Preprocessing
-    
-    # Define Transformers
-    
-    # 1. Time Transformer (Custom)
-    time_transformer = Pipeline(steps=[
-        ('binner', model_utils.TimeCategoryEncoder()),
-        ('encoder', OneHotEncoder(handle_unknown='ignore'))
-    ])
-    
-    # mood(1), diet(3), context(4)
-    categorical_features = [1, 3, 4] 
-    categorical_transformer = OneHotEncoder(handle_unknown='ignore')
-    
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('time', time_transformer, [0]), # hour is col 0
-            ('cat', categorical_transformer, categorical_features),
-            ('num', StandardScaler(), [2]) # hunger is col 2
-        ])
-    
-    # Model
+def load_feedback_data():
+    """
+    Real accepted recommendations from the feedback event log.
+    Sealed segments are compacted first so the log stays a handful of files.
+    """
+    import event_log
+    merged = event_log.compact()
+    if merged:
+        print(f"Compacted {merged} feedback log segments.")
+    return event_log.load_feedback()
+
+FEATURES = ['hour', 'mood', 'hunger', 'diet', 'context']
+
+def aggregate(df):
+    """
+    Collapses identical (features, snack_id) rows into one row with a count.
+    All features are categorical or low-cardinality, so the result is bounded
+    by the number of distinct combinations rather than the number of rows.
+    """
+    grouped = df.groupby(FEATURES + ['snack_id'], sort=False).size()
+    return grouped.rename('weight').reset_index()
+
+def build_model():
+    # Features arrive already one-hot encoded by feature_schema, so the model
+    # is the classifier alone; no ColumnTransformer runs at predict time.
     clf = RandomForestClassifier(n_estimators=100, random_state=42)
+    clf.feature_schema_version = schema.VERSION
+    return clf
+
+def top3_accuracy(probs, classes, y, sample_weight=None):
+    top3_classes = classes[np.argsort(probs, axis=1)[:, -3:]]
+    hits = (top3_classes == y[:, None]).any(axis=1)
+    return np.average(hits, weights=sample_weight)
+
+def evaluate(model, X_test, y_test, w_test=None):
+    y_pred = model.predict(X_test)
+    probs = model.predict_proba(X_test)
+    return {
+        "accuracy": accuracy_score(y_test, y_pred, sample_weight=w_test),
+        "top3_accuracy": top3_accuracy(probs, model.classes_, y_test, w_test),
+        "confusion_matrix": confusion_matrix(y_test, y_pred, sample_weight=w_test),
+    }
+
+def fit(df, aggregated=False):
+    """
+    Splits, fits and evaluates. With aggregated=True, each split is collapsed
+    into unique rows and the counts are passed on as sample_weight, for both
+    fitting and evaluation. Returns (model, metrics).
+    """
+    # Split rows first so both modes train and test on the same events
+    train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+
+    w_train = w_test = None
+    if aggregated:
+        train_df, test_df = aggregate(train_df), aggregate(test_df)
+        w_train, w_test = train_df['weight'].values, test_df['weight'].values
+        print(f"Aggregated to {len(train_df)} train / {len(test_df)} test unique rows.")
+
+    # Features (shared float32 encoding) and Target
+    X_train, y_train = schema.encode_frame(train_df), train_df['snack_id'].values
+    X_test, y_test = schema.encode_frame(test_df), test_df['snack_id'].values
+
+    model = build_model()
+    model.fit(X_train, y_train, sample_weight=w_train)
+    return model, evaluate(model, X_test, y_test, w_test)
+
+def train(data_path=DATA_PATH, model_path=model_utils.MODEL_PATH, progress=None,
+          include_feedback=False, aggregated=False):
+    """
+    Trains and saves the model.
+    progress: optional callback(stage, fraction) for callers running this as a background job.
+    include_feedback: also train on the events logged by /feedback.
+    aggregated: fit on unique rows weighted by count instead of raw rows.
+    """
+    def report(stage, fraction):
+        print(stage)
+        if progress:
+            progress(stage, fraction)
+
+    report("Loading data...", 0.0)
+    df = load_data(data_path)
+    if include_feedback:
+        feedback_df = load_feedback_data()
+        print(f"Adding {len(feedback_df)} feedback events to {len(df)} rows.")
+        df = pd.concat([df, feedback_df], ignore_index=True)
     
-    pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                               ('classifier', clf)])
-    
-    # Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    print("Training model...")
-    pipeline.fit(X_train, y_train)
-    
-    print("Evaluating...")
-    y_pred = pipeline.predict(X_test)
-    print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    report("Training model...", 0.2)
+    model, metrics = fit(df, aggregated=aggregated)
     
-    # Top-3 Accuracy
-    probs = pipeline.predict_proba(X_test)
-    top3_acc = 0
-    for i in range(len(y_test)):
-        top3_idxs = np.argsort(probs[i])[-3:]
-        classes = pipeline.classes_
-        top3_classes = classes[top3_idxs]
-        if y_test[i] in top3_classes:
-            top3_acc += 1
-    print(f"Top-3 Accuracy: {top3_acc / len(y_test):.4f}")
+    report("Evaluating...", 0.7)
+    print(f"Accuracy: {metrics['accuracy']:.4f}")
+    print(f"Top-3 Accuracy: {metrics['top3_accuracy']:.4f}")
     
     print("\nConfusion Matrix:")
-    print(confusion_matrix(y_test, y_pred))
+    print(metrics['confusion_matrix'])
     
-    # Save
-    # Save to current directory (backend/)
-    joblib.dump(pipeline, "snack_model.joblib")
-    print("Model saved to snack_model.joblib")
+    # Save next to model_utils (backend/). Written to a temp file of our own and
+    # renamed so a server or Streamlit session reloading the model never sees a
+    # partial file, even with two trainings running at once.
+    report("Saving model...", 0.9)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(model_path)), prefix=os.path.basename(model_path) + "."
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump(model, f)
+        os.replace(tmp_path, model_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    # Feature distribution of the training data, for drift checks in /stats/traffic
+    import traffic_stats
+    traffic_stats.save_training_profile(df, model_path)
+    report(f"Model saved to {model_path}", 1.0)
+
+def parity_check(data_path=DATA_PATH, include_feedback=False):
+    """
+    Trains with and without aggregation and compares the results.
+    The random forest's bootstrap draws rows, not weighted samples, so the two
+    models are close but not bit-identical.
+    """
+    import time
+
+    df = load_data(data_path)
+    if include_feedback:
+        df = pd.concat([df, load_feedback_data()], ignore_index=True)
+
+    results = {}
+    for aggregated in (False, True):
+        start = time.perf_counter()
+        model, metrics = fit(df, aggregated=aggregated)
+        metrics["seconds"] = time.perf_counter() - start
+        results[aggregated] = (model, metrics)
+
+    raw, agg = results[False][1], results[True][1]
+    print(f"{'':<16}{'raw':>10}{'aggregated':>12}")
+    for key in ("accuracy", "top3_accuracy", "seconds"):
+        print(f"{key:<16}{raw[key]:>10.4f}{agg[key]:>12.4f}")
+
+    # Compare the probabilities both models assign to the distinct inputs
+    X = schema.encode_frame(df[FEATURES].drop_duplicates())
+    raw_probs = results[False][0].predict_proba(X)
+    agg_probs = results[True][0].predict_proba(X)
+    same_top1 = (raw_probs.argmax(axis=1) == agg_probs.argmax(axis=1)).mean()
+    print(f"Max |prob diff|: {np.abs(raw_probs - agg_probs).max():.4f}")
+    print(f"Top-1 agreement: {same_top1:.4f}")
+    return results
 
 if __name__ == "__main__":
-    train()
+    import sys
+    include_feedback = "--with-feedback" in sys.argv
+    if "--parity" in sys.argv:
+        parity_check(include_feedback=include_feedback)
+    else:
+        train(include_feedback=include_feedback, aggregated="--aggregate" in sys.argv)
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Moon, Sun, Sparkles } from 'lucide-react';
@@ -29,13 +29,19 @@ function MainContent() {
   const [currentIndex, setCurrentIndex] = useState(0);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [lastInput, setLastInput] = useState(null);
+  // Bumped per /predict so cards (and their fetched explanations) never carry over
+  const [requestId, setRequestId] = useState(0);
 
   const handleRecommend = async (formData) => {
     setIsLoading(true);
     setError(null);
     try {
-      const response = await api.post('/predict', formData);
+      // Explanations are fetched per card, only when "Why this snack?" is opened
+      const response = await api.post('/predict', { ...formData, include: ['name', 'tags', 'message'] });
       setRecommendations(response.data.recommendations);
+      setLastInput(formData);
+      setRequestId((id) => id + 1);
       setCurrentIndex(0);
     } catch (err) {
       console.error(err);
@@ -47,12 +53,18 @@ function MainContent() {
 
   const handleAccept = async (snackId) => {
     try {
-      await api.post('/feedback', { snack_id: snackId });
+      // Send the input too, so the backend can log it as a training example
+      await api.post('/feedback', { snack_id: snackId, ...lastInput });
     } catch (err) {
       console.error("Failed to save feedback", err);
     }
   };
 
+  const fetchExplanation = async (snackId) => {
+    const response = await api.get('/explanation', { params: { ...lastInput, snack_id: snackId } });
+    return response.data.explanation;
+  };
+
   const handleNext = () => {
     if (currentIndex < recommendations.length - 1) {
       setCurrentIndex(prev => prev + 1);
@@ -62,6 +74,16 @@ function MainContent() {
   const currentRecommendation = recommendations[currentIndex];
   const hasNext = currentIndex < recommendations.length - 1;
 
+  // Report the card actually shown (the only one that can be accepted), so the
+  // re-ranker doesn't count alternatives the user never got to pick
+  useEffect(() => {
+    if (!currentRecommendation) return;
+    api.post('/impression', { snack_id: currentRecommendation.id, ...lastInput })
+      .catch((err) => console.error("Failed to record impression", err));
+    // Once per card per request
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [requestId, currentIndex]);
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-indigo-50 to-purple-100 dark:from-gray-900 dark:to-gray-800 transition-colors duration-300 font-sans py-12 px-4 sm:px-6 lg:px-8">
       <div className="max-w-6xl mx-auto">
@@ -110,7 +132,7 @@ function MainContent() {
             <AnimatePresence mode="wait">
               {recommendations.length > 0 ? (
                 <motion.div
-                  key={currentRecommendation.id}
+                  key={`${requestId}-${currentRecommendation.id}`}
                   initial={{ opacity: 0, scale: 0.95 }}
                   animate={{ opacity: 1, scale: 1 }}
                   exit={{ opacity: 0, scale: 0.95 }}
@@ -119,6 +141,7 @@ function MainContent() {
                   <RecommendationCard
                     recommendation={currentRecommendation}
                     onAccept={handleAccept}
+                    onExplain={fetchExplanation}
                     onNext={handleNext}
                     hasNext={hasNext}
                   />
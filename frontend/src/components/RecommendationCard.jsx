@@ -1,8 +1,18 @@
 import React, { useState } from 'react';
 import { Check, RefreshCw, Info, Tag } from 'lucide-react';
 
-export default function RecommendationCard({ recommendation, onAccept, onNext, hasNext }) {
+export default function RecommendationCard({ recommendation, onAccept, onExplain, onNext, hasNext }) {
     const [isAccepted, setIsAccepted] = useState(false);
+    const [explanation, setExplanation] = useState(recommendation?.explanation ?? null);
+
+    const handleToggle = async (e) => {
+        if (!e.target.open || explanation !== null) return;
+        try {
+            setExplanation(await onExplain(recommendation.id));
+        } catch (err) {
+            console.error("Failed to load explanation", err);
+        }
+    };
 
     const handleAccept = () => {
         onAccept(recommendation.id);
@@ -59,13 +69,13 @@ export default function RecommendationCard({ recommendation, onAccept, onNext, h
             </div>
 
             <div className="border-t border-gray-100 dark:border-gray-700 pt-6">
-                <details className="cursor-pointer group">
+                <details className="cursor-pointer group" onToggle={handleToggle}>
                     <summary className="flex items-center gap-2 text-sm font-medium text-gray-500 dark:text-gray-400 group-hover:text-indigo-600 dark:group-hover:text-indigo-400 transition-colors list-none">
                         <Info size={16} /> Why this snack?
                     </summary>
                     <div className="mt-3 text-sm text-gray-600 dark:text-gray-300 bg-gray-50 dark:bg-gray-700/50 p-4 rounded-lg">
                         <p className="mb-2"><strong>Model Confidence:</strong> <span className="text-indigo-600 dark:text-indigo-400 font-bold">{(recommendation.prob * 100).toFixed(1)}%</span></p>
-                        <p className="leading-relaxed">{recommendation.explanation}</p>
+                        <p className="leading-relaxed">{explanation ?? "Thinking..."}</p>
                     </div>
                 </details>
             </div>